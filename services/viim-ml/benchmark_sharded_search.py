@@ -0,0 +1,81 @@
+"""
+Benchmark sharded scatter-gather search throughput against shard count.
+Uses synthetic embeddings so it runs without a database or model.
+
+Usage:
+    python benchmark_sharded_search.py [--recordings 200000] [--shards 1 2 4 8]
+"""
+
+import argparse
+import time
+import uuid
+import numpy as np
+from utils.sharded_search import ShardedSearch
+
+
+def synthetic_rows(count: int, dimensions: int, seed: int = 0):
+    """Yield (record, embedding) pairs shaped like RecordingDatabase.get_embedding_rows."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, 10000):
+        embeddings = rng.standard_normal((min(10000, count - start), dimensions)).astype(np.float32)
+        for embedding in embeddings:
+            record = {
+                'recording_id': str(uuid.uuid4()),
+                'user_id': None,
+                'created_at': '2025-01-01T00:00:00',
+                'mode': 'identify',
+                'filename': 'synthetic.webm',
+                'duration_seconds': 3.0,
+                'voiceprint_id': None,
+                'quality_tier': 'accurate'
+            }
+            yield record, embedding
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recordings", type=int, default=200000)
+    parser.add_argument("--dimensions", type=int, default=192)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, args.dimensions)).astype(np.float32)
+
+    print(f"{args.recordings} recordings, {args.dimensions} dims, {args.queries} queries")
+    print(f"{'shards':>6} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'qps':>8} {'speedup':>8}")
+
+    baseline_qps = None
+    for num_shards in args.shards:
+        search = ShardedSearch(num_shards, dimensions=args.dimensions)
+        try:
+            start = time.perf_counter()
+            search.load(lambda: synthetic_rows(args.recordings, args.dimensions))
+            load_s = time.perf_counter() - start
+
+            search.search(queries[0], threshold=args.threshold, limit=args.limit)  # Warm up
+
+            latencies = []
+            start = time.perf_counter()
+            for query in queries:
+                query_start = time.perf_counter()
+                search.search(query, threshold=args.threshold, limit=args.limit)
+                latencies.append(time.perf_counter() - query_start)
+            qps = len(queries) / (time.perf_counter() - start)
+        finally:
+            search.close()
+
+        baseline_qps = baseline_qps or qps
+        print(
+            f"{num_shards:>6} {load_s:>8.1f} "
+            f"{1000 * np.percentile(latencies, 50):>8.2f} "
+            f"{1000 * np.percentile(latencies, 95):>8.2f} "
+            f"{qps:>8.1f} {qps / baseline_qps:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
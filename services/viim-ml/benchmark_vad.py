@@ -0,0 +1,74 @@
+"""
+Compare the VAD path against the untrimmed path on a set of audio files.
+Reports samples removed, forward-pass time saved and embedding agreement.
+
+Usage:
+    python benchmark_vad.py recordings/*.wav [--threshold-db 35] [--repeats 3]
+"""
+
+import argparse
+import time
+import numpy as np
+from utils.audio_processor import preprocess_audio, apply_vad
+from models.embedding_service import VoiceprintService
+
+
+def time_forward(service: VoiceprintService, audio: np.ndarray, repeats: int):
+    """Return (embedding, best forward time in ms) over several runs."""
+    best = float("inf")
+    embedding = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embedding = service.extract_embedding(audio)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return embedding, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+", help="Audio files to benchmark")
+    parser.add_argument("--threshold-db", type=float, default=35.0)
+    parser.add_argument("--min-speech-ms", type=float, default=100.0)
+    parser.add_argument("--min-silence-ms", type=float, default=200.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    service = VoiceprintService()
+    # Warm up so model loading is not counted as forward time
+    service.extract_embedding(np.zeros(16000, dtype=np.float32))
+
+    removed, saved, agreement = [], [], []
+    for path in args.files:
+        with open(path, "rb") as f:
+            audio, sr = preprocess_audio(f.read())
+
+        voiced, stats = apply_vad(
+            audio, sr,
+            threshold_db=args.threshold_db,
+            min_speech_ms=args.min_speech_ms,
+            min_silence_ms=args.min_silence_ms
+        )
+
+        full_emb, full_ms = time_forward(service, audio, args.repeats)
+        vad_emb, vad_ms = time_forward(service, voiced, args.repeats)
+        similarity = service.compute_similarity(full_emb, vad_emb)
+
+        removed.append(stats["removed_fraction"])
+        saved.append(full_ms - vad_ms)
+        agreement.append(similarity)
+        print(
+            f"{path}: removed {stats['removed_fraction']:.1%}, "
+            f"forward {full_ms:.1f}ms -> {vad_ms:.1f}ms, "
+            f"cosine agreement {similarity:.4f}"
+        )
+
+    print("-" * 60)
+    print(f"Files:               {len(args.files)}")
+    print(f"Mean samples removed: {np.mean(removed):.1%}")
+    print(f"Mean time saved:      {np.mean(saved):.1f}ms per forward pass")
+    print(f"Min agreement:        {np.min(agreement):.4f}")
+    print(f"Mean agreement:       {np.mean(agreement):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Compact the recordings table: move rows older than the retention window
+(and test-mode rows) to Parquet files partitioned by month and mode.
+
+Run this while the service is stopped (DuckDB allows one writer per file),
+or call POST /admin/compact on the running service instead.
+
+Usage:
+    python compact_recordings.py [--retention-days 30] [--keep-test]
+"""
+
+import argparse
+import logging
+from utils.database import RecordingDatabase, DB_PATH, COLD_PATH, HOT_RETENTION_DAYS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db-path", default=DB_PATH)
+    parser.add_argument("--cold-path", default=COLD_PATH)
+    parser.add_argument("--retention-days", type=int, default=HOT_RETENTION_DAYS)
+    parser.add_argument(
+        "--keep-test", action="store_true",
+        help="Keep recent test-mode rows in the hot table"
+    )
+    args = parser.parse_args()
+
+    with RecordingDatabase(args.db_path, cold_path=args.cold_path) as db:
+        result = db.compact(args.retention_days, include_test=not args.keep_test)
+
+    logger.info(f"✓ Moved {result['moved']} recordings (months: {', '.join(result['months']) or 'none'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,8 @@ Download ECAPA-TDNN model and upload to Cloud Storage.
 This runs once to cache the model in GCS.
 """
 
-import os
 from speechbrain.inference.speaker import EncoderClassifier
-from google.cloud import storage
-import shutil
+from utils.model_sync import GCSBackend, push
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -32,28 +30,15 @@ def download_model():
         return False
 
 def upload_to_gcs():
-    """Upload model directory to Cloud Storage."""
+    """Upload changed model files and the manifest to Cloud Storage."""
     logger.info(f"Uploading model to gs://{BUCKET_NAME}/{MODEL_GCS_PATH}")
     
     try:
-        client = storage.Client()
-        bucket = client.bucket(BUCKET_NAME)
-        
-        # Walk through local directory and upload all files
-        file_count = 0
-        for root, dirs, files in os.walk(LOCAL_MODEL_DIR):
-            for file in files:
-                local_path = os.path.join(root, file)
-                # Create GCS path relative to model dir
-                relative_path = os.path.relpath(local_path, LOCAL_MODEL_DIR)
-                gcs_path = os.path.join(MODEL_GCS_PATH, relative_path).replace('\\', '/')
-                
-                logger.info(f"Uploading {local_path} -> gs://{BUCKET_NAME}/{gcs_path}")
-                blob = bucket.blob(gcs_path)
-                blob.upload_from_filename(local_path)
-                file_count += 1
-        
-        logger.info(f"✓ Uploaded {file_count} files to Cloud Storage")
+        result = push(LOCAL_MODEL_DIR, GCSBackend(BUCKET_NAME, MODEL_GCS_PATH))
+        logger.info(
+            f"✓ Uploaded {len(result['uploaded'])} files to Cloud Storage "
+            f"({len(result['skipped'])} unchanged)"
+        )
         return True
         
     except Exception as e:
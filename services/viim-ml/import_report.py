@@ -0,0 +1,98 @@
+"""
+Report per-module import time for the service and enforce a startup budget.
+Runs `python -X importtime -c "import main"` in a fresh interpreter, so the
+numbers match a cold worker boot.
+
+Usage:
+    python import_report.py [--top 25]
+    python import_report.py --budget-ms 1500   # exit 1 if over budget or a heavy module loads
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Modules that must only load when their stage first runs (or during warmup)
+HEAVY_MODULES = ("torch", "torchaudio", "speechbrain", "librosa", "soundfile", "soxr", "duckdb")
+
+# Cumulative import time allowed for `import main` (tests/test_import_budget.py enforces it)
+DEFAULT_BUDGET_MS = 1500.0
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str):
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        Tuple of (wall time in ms, list of (module, self_us, cumulative_us, depth))
+    """
+    service_dir = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=service_dir,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return wall_ms, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail if the cumulative import time exceeds this")
+    args = parser.parse_args()
+
+    wall_ms, modules = measure(args.module)
+    total_us = sum(self_us for _, self_us, _, _ in modules)
+
+    # Top-level packages by self time, so e.g. all of fastapi.* shows as one row
+    packages = {}
+    for name, self_us, _, _ in modules:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    print(f"import {args.module}: {total_us / 1000:.1f}ms in imports, {wall_ms:.1f}ms wall (incl. interpreter start)")
+    print()
+    print(f"{'package':<30} {'ms':>8} {'share':>7}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<30} {self_us / 1000:>8.1f} {self_us / total_us:>7.1%}")
+
+    print()
+    print(f"{'module (cumulative)':<50} {'ms':>8}")
+    for name, _, cumulative_us, _ in sorted(modules, key=lambda m: -m[2])[:args.top]:
+        print(f"{name:<50} {cumulative_us / 1000:>8.1f}")
+
+    heavy = sorted({name.split(".")[0] for name, _, _, _ in modules} & set(HEAVY_MODULES))
+    print()
+    print(f"Heavy modules loaded at import: {', '.join(heavy) or 'none'}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: {', '.join(heavy)} should load lazily")
+        failed = True
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"FAIL: {total_us / 1000:.1f}ms exceeds budget of {args.budget_ms:.0f}ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,37 @@ FastAPI service for voice fingerprint embedding extraction.
 Provides REST API endpoints for ML model inference.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, Header, Depends, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import numpy as np
+import asyncio
+import json
 import logging
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
-from utils.audio_processor import preprocess_audio, validate_audio_quality
+from utils.audio_processor import (
+    preprocess_audio, preprocess_waveform, validate_audio_quality, apply_vad, encode_wav,
+    batch_quality_metrics, decode_audio, resample_audio
+)
 from models.embedding_service import VoiceprintService
-from utils.database import RecordingDatabase
+from utils.database import RecordingDatabase, HOT_RETENTION_DAYS, EMBEDDING_VERSION
+from utils.quality_tiers import QualityTier, get_tier
+from utils.admission import AdmissionController, AdmissionRejected, priority_for_mode
+from utils.streaming import StreamingSession, StreamLimitExceeded, CLOSE_POLICY
+from utils.sharded_search import ShardedSearch
+from utils.search_cache import SearchResultCache
+from utils.model_sync import read_local_manifest, verify_manifest
+from utils.upload_intake import UploadSizeLimitMiddleware, UploadTooLarge, read_upload, inspect_upload
+from utils.backfill import BackfillJob, read_checkpoint
+from utils.profiling import sample_stacks, to_collapsed, to_speedscope
+from utils.enrollment import quality_weights, build_template
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -36,12 +55,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Largest accepted upload (10s of uncompressed 48kHz stereo float is ~3.8MB)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(8 * 1024 * 1024)))
+
+# Reject oversized bodies while they stream in, before multipart parsing buffers them
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + 64 * 1024,  # Allow for multipart framing and form fields
+    paths=("/extract-embedding",)
+)
+
+# Multi-clip enrollment: clips per request and the minimum quality weight for a clip to be used
+ENROLL_MAX_CLIPS = int(os.getenv("ENROLL_MAX_CLIPS", "10"))
+ENROLL_MIN_CLIP_WEIGHT = float(os.getenv("ENROLL_MIN_CLIP_WEIGHT", "0.1"))
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=ENROLL_MAX_CLIPS * MAX_UPLOAD_BYTES + 64 * 1024,
+    paths=("/enroll",)
+)
+
+# Caps on one /ws/stream-embedding session (bytes received, wall time from start to stop)
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(MAX_UPLOAD_BYTES)))
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "30"))
+
+# Drop internal pauses before inference (can be overridden per request)
+VAD_ENABLED = os.getenv("VAD_ENABLED", "false").lower() in ("1", "true", "yes")
+# Energy VAD tuning (see benchmark_vad.py to pick values for your recordings)
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "35"))
+VAD_MIN_SPEECH_MS = float(os.getenv("VAD_MIN_SPEECH_MS", "100"))
+VAD_MIN_SILENCE_MS = float(os.getenv("VAD_MIN_SILENCE_MS", "200"))
+
+# Model cache baked into the image and how strictly to check it against manifest.json
+MODEL_DIR = os.getenv("MODEL_DIR", "/root/.cache/speechbrain/spkrec-ecapa-voxceleb")
+MODEL_MANIFEST_CHECK = os.getenv("MODEL_MANIFEST_CHECK", "hash")  # 'hash', 'size' or 'off'
+MODEL_MANIFEST_STRICT = os.getenv("MODEL_MANIFEST_STRICT", "false").lower() in ("1", "true", "yes")
+_model_manifest_problems: List[str] = []
+
+# Import the audio/ML stack and load the model at startup instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+# Token required for /admin endpoints (admin endpoints are disabled if unset)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Bounded work queue in front of preprocessing and inference
+_admission = AdmissionController(
+    max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+    default_deadline=float(os.getenv("REQUEST_DEADLINE_MS", "30000")) / 1000.0
+)
+
 # Initialize embedding service (lazy load on first request)
 _embedding_service: Optional[VoiceprintService] = None
 
 # Initialize database (lazy load on first request)
 _database: Optional[RecordingDatabase] = None
 
+# Sharded search (enabled when SEARCH_SHARDS > 0, started on first search)
+SEARCH_SHARDS = int(os.getenv("SEARCH_SHARDS", "0"))
+_sharded_search: Optional[ShardedSearch] = None
+_sharded_search_lock = threading.Lock()
+
+# Nearest-recording result cache (SEARCH_CACHE_SIZE=0 disables it)
+_search_cache = SearchResultCache(capacity=int(os.getenv("SEARCH_CACHE_SIZE", "256")))
+
+# Keep uploaded audio so recordings can be re-embedded when EMBEDDING_VERSION changes (off if unset)
+AUDIO_STORE_DIR = os.getenv("AUDIO_STORE_DIR")
+
+# Background re-embedding into EMBEDDING_VERSION (started via POST /admin/backfill)
+BACKFILL_CHECKPOINT_PATH = os.getenv("BACKFILL_CHECKPOINT_PATH", "backfill_checkpoint.json")
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "16"))
+BACKFILL_MAX_RATE = float(os.getenv("BACKFILL_MAX_RATE", "2.0"))  # Recordings per second
+_backfill_job: Optional[BackfillJob] = None
+
+# Refuse to serve EMBEDDING_VERSION (searches return 503, /health is unhealthy) until
+# the backfill has re-embedded every recording with stored audio; false only logs the gap
+EMBEDDING_VERSION_STRICT = os.getenv("EMBEDDING_VERSION_STRICT", "true").lower() in ("1", "true", "yes")
+_embedding_version_status: Optional[Dict[str, Any]] = None
+
+
+class EmbeddingVersionNotReady(RuntimeError):
+    """Raised when searching EMBEDDING_VERSION before the backfill has covered every recording."""
+
 
 def get_embedding_service() -> VoiceprintService:
     """Lazy initialization of embedding service."""
@@ -56,14 +150,292 @@ def get_database() -> RecordingDatabase:
     global _database
     if _database is None:
         _database = RecordingDatabase()
+        _database.add_insert_listener(
+            lambda record, embedding: _search_cache.on_insert(record, embedding, EMBEDDING_VERSION)
+        )
     return _database
 
 
+def get_sharded_search() -> Optional[ShardedSearch]:
+    """Lazy start of the search shards, loaded from the hot table (None if disabled)."""
+    global _sharded_search
+    if _sharded_search is None and SEARCH_SHARDS > 0:
+        with _sharded_search_lock:
+            if _sharded_search is None:
+                db = get_database()
+                sharded = ShardedSearch(SEARCH_SHARDS)
+                # Listen before loading so recordings inserted during the load are kept,
+                # and ahead of the search cache so its generation moves only once
+                # the shard can return the new row
+                db.add_insert_listener(sharded.add, first=True)
+                try:
+                    sharded.load(lambda: db.get_embedding_rows(embedding_version=EMBEDDING_VERSION))
+                except Exception:
+                    db.remove_insert_listener(sharded.add)
+                    sharded.close()
+                    raise
+                _sharded_search = sharded
+    return _sharded_search
+
+
+def reload_search_index() -> None:
+    """
+    Rebuild the search shards from the database, then drop cached results (blocking).
+    
+    Used after rows leave the hot table or gain embeddings of the current
+    version. The shards swap in the new contents atomically; the cache is
+    cleared only after the swap so it is not refilled from the old contents.
+    """
+    if _sharded_search is not None:
+        db = get_database()
+        _sharded_search.load(lambda: db.get_embedding_rows(embedding_version=EMBEDDING_VERSION))
+    _search_cache.clear()
+
+
+def embedding_version_status(refresh: bool = False) -> Dict[str, Any]:
+    """
+    Whether EMBEDDING_VERSION is ready to serve (blocking, cached until refreshed).
+    
+    Recordings without an embedding of the version are invisible to its
+    searches, so serving it before the backfill has re-embedded them
+    silently drops matches. Only rows the backfill can still fix hold it
+    back: rows with stored audio until a backfill pass has completed, and
+    rows it failed on (listed in its checkpoint). Rows without stored audio
+    can never be re-embedded; they are reported as unsearchable instead.
+    Refreshed when a backfill run ends.
+    
+    Returns:
+        Dict with 'problems' (empty once ready) and 'unsearchable' (number
+        of recordings that will stay missing from this version's searches)
+    """
+    global _embedding_version_status
+    if _embedding_version_status is None or refresh:
+        problems = []
+        missing = get_database().count_missing_embeddings(EMBEDDING_VERSION)
+        state = _backfill_job.state if _backfill_job is not None else read_checkpoint(
+            BACKFILL_CHECKPOINT_PATH, EMBEDDING_VERSION
+        )
+        completed = bool(state and state['completed_at'])  # Any pass, not just the latest run
+        if missing['with_audio'] and not completed:
+            problems.append(
+                f"{missing['with_audio']} recordings with stored audio have no "
+                f"{EMBEDDING_VERSION} embedding yet"
+            )
+        failed = len(state['failed_ids']) if state else 0
+        if failed:
+            problems.append(f"{failed} recordings failed to re-embed")
+        for problem in problems:
+            logger.warning(f"Embedding version {EMBEDDING_VERSION}: {problem}")
+        
+        # After a completed pass, rows still missing with a file_path had their audio removed
+        unsearchable = missing['without_audio'] + (missing['with_audio'] if completed else 0)
+        if unsearchable:
+            logger.warning(
+                f"Embedding version {EMBEDDING_VERSION}: {unsearchable} recordings have no "
+                f"stored audio and will not appear in its searches"
+            )
+        _embedding_version_status = {'problems': problems, 'unsearchable': unsearchable}
+    return _embedding_version_status
+
+
+def nearest_recordings(
+    query_emb: np.ndarray,
+    threshold: float,
+    limit: int,
+    exclude_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    embedding_version: str = EMBEDDING_VERSION
+) -> List[dict]:
+    """
+    Find the recordings most similar to an embedding (blocking).
+    
+    Only recordings with an embedding of ``embedding_version`` are compared.
+    Raises EmbeddingVersionNotReady for the deployment's own version until
+    every recording with stored audio has been backfilled (unless
+    EMBEDDING_VERSION_STRICT is off).
+    Results are cached; the cache is patched as recordings are inserted.
+    Uses the search shards when enabled. Time-filtered searches and searches
+    of other versions go to the database, since the shards only hold the
+    hot table at the current version.
+    """
+    if EMBEDDING_VERSION_STRICT and embedding_version == EMBEDDING_VERSION:
+        problems = embedding_version_status()['problems']
+        if problems:
+            raise EmbeddingVersionNotReady(
+                f"Embedding version {EMBEDDING_VERSION} is not ready to serve "
+                f"({'; '.join(problems)}); run POST /admin/backfill"
+            )
+    
+    db = get_database()
+    cache_key = _search_cache.key(query_emb, threshold, limit, exclude_id, since, embedding_version)
+    generation = _search_cache.generation  # Before searching, so concurrent inserts are noticed
+    cached = _search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    use_shards = since is None and embedding_version == EMBEDDING_VERSION
+    sharded = get_sharded_search() if use_shards else None
+    if sharded is not None:
+        matches = sharded.search(query_emb, threshold=threshold, limit=limit, exclude_id=exclude_id)
+    else:
+        matches = db.search_by_embedding(
+            query_emb, threshold=threshold, limit=limit * 2, since=since,
+            embedding_version=embedding_version
+        )  # Get more to filter
+        
+        # Exclude the current recording if provided
+        if exclude_id:
+            matches = [m for m in matches if m['recording_id'] != exclude_id]
+        
+        # Limit to requested number
+        matches = matches[:limit]
+    
+    _search_cache.put(
+        cache_key, query_emb, threshold, limit, exclude_id, since, embedding_version, matches,
+        generation=generation
+    )
+    return matches
+
+
+def store_audio(recording_id: str, audio_format: str, audio_bytes: bytes) -> Optional[str]:
+    """
+    Save a recording's audio under AUDIO_STORE_DIR for later re-embedding.
+    
+    Returns:
+        The file path, or None if audio storage is disabled or failed
+    """
+    if not AUDIO_STORE_DIR:
+        return None
+    try:
+        os.makedirs(AUDIO_STORE_DIR, exist_ok=True)
+        path = os.path.join(AUDIO_STORE_DIR, f"{recording_id}.{audio_format}")
+        with open(path, "wb") as f:
+            f.write(audio_bytes)
+        return path
+    except OSError as e:
+        logger.warning(f"Failed to store audio for {recording_id}: {str(e)}")
+        return None
+
+
+@app.on_event("startup")
+def verify_model_files():
+    """Check the model cache against manifest.json written by sync_models.py."""
+    global _model_manifest_problems
+    if MODEL_MANIFEST_CHECK == "off" or read_local_manifest(MODEL_DIR) is None:
+        return
+    
+    _model_manifest_problems = verify_manifest(
+        MODEL_DIR, check_hashes=MODEL_MANIFEST_CHECK == "hash"
+    )
+    if not _model_manifest_problems:
+        logger.info(f"Model files in {MODEL_DIR} match manifest")
+        return
+    
+    for problem in _model_manifest_problems:
+        logger.error(f"Model manifest: {problem}")
+    if MODEL_MANIFEST_STRICT:
+        raise RuntimeError(f"Model files in {MODEL_DIR} do not match manifest")
+
+
+def warmup() -> dict:
+    """
+    Load everything the request path defers (blocking).
+    
+    Heavy modules (librosa, soundfile, soxr, torch, speechbrain, duckdb) are
+    only imported when their stage first runs, so workers boot quickly; this
+    pays those costs up front.
+    
+    Returns:
+        Seconds spent per stage
+    """
+    timings = {}
+    
+    start = time.perf_counter()
+    import librosa, soundfile, soxr  # noqa: F401
+    timings['audio_imports'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    get_database()
+    timings['database'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    get_embedding_service().warmup()
+    timings['model'] = time.perf_counter() - start
+    
+    logger.info(f"Warmup complete: {', '.join(f'{k}={v:.2f}s' for k, v in timings.items())}")
+    return {stage: round(seconds, 3) for stage, seconds in timings.items()}
+
+
+@app.on_event("startup")
+def warmup_on_startup():
+    """Run warmup before serving when WARMUP_ON_STARTUP is set."""
+    if WARMUP_ON_STARTUP:
+        warmup()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """Stop the backfill (its checkpoint is kept) and search shard processes."""
+    if _backfill_job is not None:
+        _backfill_job.stop()
+    if _sharded_search is not None:
+        _sharded_search.close()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard for /admin endpoints (X-Admin-Token header must match ADMIN_TOKEN)."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
 # Response models
 class EmbeddingResponse(BaseModel):
     embedding: List[float]
     dimensions: int
     audio_duration: float
+    quality_tier: str
+    embedding_version: str = EMBEDDING_VERSION
+    vad_removed_fraction: Optional[float] = None
+
+
+class EnrollmentClip(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    used: bool
+    weight: Optional[float] = None
+    duration: Optional[float] = None
+    speech_ratio: Optional[float] = None
+    snr_db: Optional[float] = None
+    speech_band_ratio: Optional[float] = None
+    energy: Optional[float] = None
+    dynamic_range: Optional[float] = None
+    similarity_to_template: Optional[float] = None
+    recording_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class EnrollResponse(BaseModel):
+    voiceprint_id: str
+    embedding: List[float]
+    dimensions: int
+    embedding_version: str
+    clips_used: int
+    clips: List[EnrollmentClip]
+
+
+class VerifyRequest(BaseModel):
+    voiceprint_id: str
+    embedding: List[float]
+    embedding_version: Optional[str] = None  # Version of embedding (default: EMBEDDING_VERSION)
+
+
+class VerifyResponse(BaseModel):
+    voiceprint_id: str
+    similarity: float
+    match: bool
+    threshold: float
 
 
 class SimilarityRequest(BaseModel):
@@ -92,6 +464,19 @@ async def health():
     """Detailed health check."""
     try:
         service = get_embedding_service()
+        if _model_manifest_problems:
+            return {
+                "status": "unhealthy",
+                "error": "Model files do not match manifest",
+                "problems": _model_manifest_problems
+            }
+        version_problems = (await run_in_threadpool(embedding_version_status))['problems']
+        if version_problems and EMBEDDING_VERSION_STRICT:
+            return {
+                "status": "unhealthy",
+                "error": f"Embedding version {EMBEDDING_VERSION} is not fully backfilled",
+                "problems": version_problems
+            }
         return {
             "status": "healthy",
             "model_loaded": True,
@@ -104,12 +489,194 @@ async def health():
         }
 
 
+def _apply_vad(audio: np.ndarray, sample_rate: int):
+    """Run apply_vad with the VAD_* settings."""
+    return apply_vad(
+        audio, sample_rate,
+        threshold_db=VAD_THRESHOLD_DB,
+        min_speech_ms=VAD_MIN_SPEECH_MS,
+        min_silence_ms=VAD_MIN_SILENCE_MS
+    )
+
+
+def _embed_audio_bytes(audio_bytes: bytes, quality_tier: QualityTier, use_vad: bool):
+    """
+    Preprocess an uploaded clip and extract its embedding (blocking, CPU-heavy).
+    
+    Returns:
+        Tuple of (embedding, sample_rate, duration, vad_stats, extra_metadata)
+    
+    Raises:
+        ValueError: If the audio is invalid or too low quality
+    """
+    # Preprocess audio
+    audio_array, sample_rate = preprocess_audio(
+        audio_bytes,
+        max_duration=quality_tier.max_duration,
+        res_type=quality_tier.res_type
+    )
+    
+    # Validate audio quality
+    if not validate_audio_quality(audio_array, sample_rate):
+        raise ValueError("Audio quality too low (insufficient energy or dynamic range)")
+    
+    # Calculate duration
+    duration = len(audio_array) / sample_rate
+    
+    # Drop internal pauses so the model only sees speech
+    extra_metadata = {}
+    vad_stats = None
+    if use_vad:
+        audio_array, vad_stats = _apply_vad(audio_array, sample_rate)
+        extra_metadata['vad'] = vad_stats
+        logger.info(
+            f"VAD removed {vad_stats['removed_fraction']:.1%} of samples "
+            f"({vad_stats['input_samples']} -> {vad_stats['output_samples']})"
+        )
+    
+    # Extract embedding
+    service = get_embedding_service()
+    start = time.perf_counter()
+    embedding = service.extract_embedding(audio_array, precision=quality_tier.precision)
+    extra_metadata['forward_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    
+    logger.info(
+        f"Extracted embedding: {len(embedding)} dimensions, duration: {duration:.2f}s, "
+        f"forward pass: {extra_metadata['forward_ms']:.1f}ms, tier: {quality_tier.name}"
+    )
+    
+    return embedding, sample_rate, duration, vad_stats, extra_metadata
+
+
+def _inspect_and_embed(audio_bytes: bytes, quality_tier: QualityTier, use_vad: bool):
+    """
+    Run the intake probe and silence check, then embed the clip (blocking).
+    
+    The probe spawns ffprobe/ffmpeg for most containers, so it runs inside
+    the admitted section where admission bounds its concurrency; it still
+    rejects bad uploads before the full decode.
+    """
+    probe = inspect_upload(audio_bytes)
+    if probe is not None:
+        logger.info(
+            f"Probed {probe['source']}: duration {probe['duration']}, "
+            f"sample rate {probe['sample_rate']}"
+        )
+    return _embed_audio_bytes(audio_bytes, quality_tier, use_vad)
+
+
+def _enroll_clips(clips: List[bytes], quality_tier: QualityTier, use_vad: bool) -> dict:
+    """
+    Preprocess, score and embed enrollment clips and build the template (blocking).
+    
+    Each clip first goes through the intake probe (header duration and
+    sample rate, prefix energy), so out-of-range or silent clips are
+    rejected before any of them is fully decoded and resampled.
+    All clips are scored together by batch_quality_metrics on the decoded
+    audio (resampled, but before normalization and trimming, which would
+    hide level and noise floor). Clips that fail preprocessing or weigh less
+    than ENROLL_MIN_CLIP_WEIGHT are reported but left out of the template.
+    
+    Returns:
+        Dict with 'template', 'clips' (per-clip report), 'embeddings' and
+        'durations' (clip index -> value for the clips used)
+    
+    Raises:
+        ValueError: If no clip is usable
+    """
+    reports = [{'index': index, 'used': False} for index in range(len(clips))]
+    decoded = {}
+    waveforms = {}
+    sample_rate = 16000
+    for index, audio_bytes in enumerate(clips):
+        try:
+            inspect_upload(audio_bytes)
+            audio, sr = decode_audio(audio_bytes)
+            audio = resample_audio(audio, sr, sample_rate, quality_tier.res_type)
+            waveforms[index], _ = preprocess_waveform(
+                audio,
+                sample_rate,
+                target_sr=sample_rate,
+                max_duration=quality_tier.max_duration,
+                res_type=quality_tier.res_type
+            )
+            decoded[index] = audio
+        except ValueError as e:
+            reports[index]['error'] = str(e)
+    if not waveforms:
+        raise ValueError("No enrollment clip could be processed")
+    
+    indices = list(waveforms)
+    metrics = batch_quality_metrics([decoded[index] for index in indices], sample_rate)
+    weights = quality_weights(metrics)
+    for row, index in enumerate(indices):
+        reports[index].update({
+            'weight': float(weights[row]),
+            'duration': float(metrics['duration'][row]),
+            'speech_ratio': float(metrics['speech_ratio'][row]),
+            'snr_db': float(metrics['snr_db'][row]),
+            'speech_band_ratio': float(metrics['speech_band_ratio'][row]),
+            'energy': float(metrics['energy'][row]),
+            'dynamic_range': float(metrics['dynamic_range'][row]),
+        })
+    
+    used_rows = [row for row in range(len(indices)) if weights[row] >= ENROLL_MIN_CLIP_WEIGHT]
+    for row in set(range(len(indices))) - set(used_rows):
+        reports[indices[row]]['error'] = "Quality too low (too quiet, noisy or little speech)"
+    if not used_rows:
+        raise ValueError("No enrollment clip passed the quality checks")
+    
+    used_audio = [waveforms[indices[row]] for row in used_rows]
+    if use_vad:
+        used_audio = [_apply_vad(audio, sample_rate)[0] for audio in used_audio]
+    
+    service = get_embedding_service()
+    embeddings = np.stack(service.batch_extract(used_audio, precision=quality_tier.precision))
+    template, similarities = build_template(embeddings, weights[used_rows])
+    
+    for row, embedding_similarity in zip(used_rows, similarities):
+        reports[indices[row]].update({
+            'used': True,
+            'similarity_to_template': float(embedding_similarity)
+        })
+    
+    logger.info(
+        f"Built enrollment template from {len(used_rows)}/{len(clips)} clips "
+        f"(weights: {', '.join(f'{weights[row]:.2f}' for row in used_rows)})"
+    )
+    return {
+        'template': template,
+        'clips': reports,
+        'embeddings': {indices[row]: embeddings[i] for i, row in enumerate(used_rows)},
+        'durations': {indices[row]: float(metrics['duration'][row]) for row in used_rows},
+        'sample_rate': sample_rate
+    }
+
+
+def _reembed_recording(audio_bytes: bytes, row: dict) -> np.ndarray:
+    """Embed stored audio with the current model and preprocessing (backfill, blocking)."""
+    embedding, _, _, _, _ = _embed_audio_bytes(audio_bytes, get_tier(row.get('quality_tier')), VAD_ENABLED)
+    return embedding
+
+
+@app.get("/metrics")
+async def metrics():
+    """Service metrics (admission queue, shed counts, queue wait time, search cache)."""
+    return {
+        "admission": _admission.stats(),
+        "search_cache": _search_cache.stats()
+    }
+
+
 @app.post("/extract-embedding", response_model=EmbeddingResponse)
 async def extract_embedding(
     audio: UploadFile = File(...),
     user_id: Optional[str] = Form(None),
     mode: Optional[str] = Form(None),
-    voiceprint_id: Optional[str] = Form(None)
+    voiceprint_id: Optional[str] = Form(None),
+    vad: Optional[bool] = Form(None),
+    tier: Optional[str] = Form(None),
+    x_request_deadline_ms: Optional[float] = Header(None)
 ):
     """
     Extract speaker embedding from audio file and optionally store in database.
@@ -119,36 +686,34 @@ async def extract_embedding(
         user_id: Optional user ID for database storage
         mode: Optional mode ('test', 'enroll', 'identify')
         voiceprint_id: Optional voiceprint ID for enrollment
+        vad: Drop internal non-speech before inference (default: VAD_ENABLED)
+        tier: Quality tier ('fast', 'balanced', 'accurate'; default: 'accurate')
+        x_request_deadline_ms: Time budget for this request in milliseconds
+            (X-Request-Deadline-Ms header; default: REQUEST_DEADLINE_MS)
     
     Returns:
         Embedding vector (192 dimensions) and metadata
     """
+    deadline = _admission.deadline_from_budget(x_request_deadline_ms)
     try:
-        # Read audio file
-        audio_bytes = await audio.read()
+        quality_tier = get_tier(tier)
+        
+        # Read audio file (bounded)
+        audio_bytes = await read_upload(audio, MAX_UPLOAD_BYTES)
         if len(audio_bytes) == 0:
             raise HTTPException(status_code=400, detail="Empty audio file")
         
         logger.info(f"Processing audio file: {audio.filename}, size: {len(audio_bytes)} bytes")
         
-        # Preprocess audio
-        audio_array, sample_rate = preprocess_audio(audio_bytes)
-        
-        # Validate audio quality
-        if not validate_audio_quality(audio_array, sample_rate):
-            raise HTTPException(
-                status_code=400,
-                detail="Audio quality too low (insufficient energy or dynamic range)"
-            )
-        
-        # Extract embedding
-        service = get_embedding_service()
-        embedding = service.extract_embedding(audio_array)
-        
-        # Calculate duration
-        duration = len(audio_array) / sample_rate
-        
-        logger.info(f"Extracted embedding: {len(embedding)} dimensions, duration: {duration:.2f}s")
+        # Probe, preprocess and embed once admitted (may be shed under load)
+        embedding, sample_rate, duration, vad_stats, extra_metadata = await _admission.run(
+            _inspect_and_embed,
+            audio_bytes,
+            quality_tier,
+            VAD_ENABLED if vad is None else vad,
+            priority=priority_for_mode(mode),
+            deadline=deadline
+        )
         
         # Store in database if user_id or mode is provided (especially for enroll/identify)
         if (user_id or mode) and mode != "test":  # Store for enroll and identify, skip test by default
@@ -163,12 +728,13 @@ async def extract_embedding(
                     if ext in ['wav', 'mp3', 'ogg', 'm4a', 'flac']:
                         audio_format = ext
                 
-                # Store recording metadata
-                db.insert_recording(
+                # Store recording metadata (and the audio itself if AUDIO_STORE_DIR is set)
+                await run_in_threadpool(
+                    db.insert_recording,
                     recording_id=recording_id,
                     user_id=user_id,
                     filename=audio.filename or f"recording_{recording_id}.{audio_format}",
-                    file_path=None,  # We're not storing files, just metadata
+                    file_path=await run_in_threadpool(store_audio, recording_id, audio_format, audio_bytes),
                     duration_seconds=duration,
                     file_size_bytes=len(audio_bytes),
                     sample_rate=sample_rate,
@@ -176,10 +742,12 @@ async def extract_embedding(
                     mode=mode or 'test',
                     embedding=embedding,
                     voiceprint_id=voiceprint_id,
+                    quality_tier=quality_tier.name,
                     metadata={
                         'source': 'ml_service',
                         'model': 'speechbrain/spkrec-ecapa-voxceleb',
-                        'is_test': mode == 'test'
+                        'is_test': mode == 'test',
+                        **extra_metadata
                     }
                 )
                 logger.info(f"Recording {recording_id} stored in database")
@@ -197,11 +765,12 @@ async def extract_embedding(
                     if ext in ['wav', 'mp3', 'ogg', 'm4a', 'flac']:
                         audio_format = ext
                 
-                db.insert_recording(
+                await run_in_threadpool(
+                    db.insert_recording,
                     recording_id=recording_id,
                     user_id=user_id,
                     filename=audio.filename or f"recording_{recording_id}.{audio_format}",
-                    file_path=None,
+                    file_path=await run_in_threadpool(store_audio, recording_id, audio_format, audio_bytes),
                     duration_seconds=duration,
                     file_size_bytes=len(audio_bytes),
                     sample_rate=sample_rate,
@@ -209,10 +778,12 @@ async def extract_embedding(
                     mode='test',
                     embedding=embedding,
                     voiceprint_id=None,
+                    quality_tier=quality_tier.name,
                     metadata={
                         'source': 'ml_service',
                         'model': 'speechbrain/spkrec-ecapa-voxceleb',
-                        'is_test': True
+                        'is_test': True,
+                        **extra_metadata
                     }
                 )
                 logger.info(f"Test recording {recording_id} stored in database")
@@ -222,9 +793,21 @@ async def extract_embedding(
         return EmbeddingResponse(
             embedding=embedding.tolist(),
             dimensions=len(embedding),
-            audio_duration=duration
+            audio_duration=duration,
+            vad_removed_fraction=vad_stats['removed_fraction'] if vad_stats else None,
+            quality_tier=quality_tier.name
         )
     
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -233,6 +816,186 @@ async def extract_embedding(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.post("/enroll", response_model=EnrollResponse)
+async def enroll(
+    audio: List[UploadFile] = File(...),
+    user_id: Optional[str] = Form(None),
+    voiceprint_id: Optional[str] = Form(None),
+    vad: Optional[bool] = Form(None),
+    tier: Optional[str] = Form(None),
+    x_request_deadline_ms: Optional[float] = Header(None)
+):
+    """
+    Enroll a voiceprint from several clips as one quality-weighted template.
+    
+    Clips failing the intake probe are rejected before decoding. The rest
+    are weighted by SNR, speech-band energy and seconds of speech (0 below
+    an absolute level floor); clips under ENROLL_MIN_CLIP_WEIGHT are left
+    out and the template is the weighted mean of the others' embeddings,
+    not a plain average. The used clips are stored as 'enroll' recordings
+    and the template replaces any previous one for the voiceprint.
+    
+    Args:
+        audio: Enrollment clips (1 to ENROLL_MAX_CLIPS files)
+        user_id: Optional user ID
+        voiceprint_id: Voiceprint to (re-)enroll (default: a new ID)
+        vad: Drop internal non-speech before inference (default: VAD_ENABLED)
+        tier: Quality tier ('fast', 'balanced', 'accurate'; default: 'accurate')
+        x_request_deadline_ms: Time budget for this request in milliseconds
+    
+    Returns:
+        Template embedding and a per-clip quality report
+    """
+    deadline = _admission.deadline_from_budget(x_request_deadline_ms)
+    try:
+        quality_tier = get_tier(tier)
+        if len(audio) > ENROLL_MAX_CLIPS:
+            raise ValueError(f"Too many clips: {len(audio)} (maximum {ENROLL_MAX_CLIPS})")
+        
+        clips = []
+        for upload in audio:
+            audio_bytes = await read_upload(upload, MAX_UPLOAD_BYTES)
+            if len(audio_bytes) == 0:
+                raise HTTPException(status_code=400, detail=f"Empty audio file: {upload.filename}")
+            clips.append(audio_bytes)
+        
+        result = await _admission.run(
+            _enroll_clips,
+            clips,
+            quality_tier,
+            VAD_ENABLED if vad is None else vad,
+            priority=priority_for_mode("enroll"),
+            deadline=deadline
+        )
+        
+        voiceprint_id = voiceprint_id or str(uuid.uuid4())
+        db = get_database()
+        clip_reports = result['clips']
+        for index, embedding in result['embeddings'].items():
+            upload = audio[index]
+            recording_id = str(uuid.uuid4())
+            audio_format = "webm"
+            if upload.filename:
+                ext = os.path.splitext(upload.filename)[1].lower().lstrip('.')
+                if ext in ['wav', 'mp3', 'ogg', 'm4a', 'flac']:
+                    audio_format = ext
+            
+            if await run_in_threadpool(
+                db.insert_recording,
+                recording_id=recording_id,
+                user_id=user_id,
+                filename=upload.filename or f"recording_{recording_id}.{audio_format}",
+                file_path=await run_in_threadpool(store_audio, recording_id, audio_format, clips[index]),
+                duration_seconds=result['durations'][index],
+                file_size_bytes=len(clips[index]),
+                sample_rate=result['sample_rate'],
+                audio_format=audio_format,
+                mode='enroll',
+                embedding=embedding,
+                voiceprint_id=voiceprint_id,
+                quality_tier=quality_tier.name,
+                metadata={
+                    'source': 'ml_service_enroll',
+                    'model': 'speechbrain/spkrec-ecapa-voxceleb',
+                    'is_test': False,
+                    'enrollment_weight': clip_reports[index]['weight']
+                }
+            ):
+                clip_reports[index]['recording_id'] = recording_id
+        
+        used = [report for report in clip_reports if report['used']]
+        await run_in_threadpool(
+            db.upsert_template,
+            voiceprint_id,
+            user_id,
+            result['template'],
+            len(used),
+            sum(report['weight'] for report in used),
+            {
+                'recording_ids': [report.get('recording_id') for report in used],
+                'weights': [report['weight'] for report in used],
+                'quality_tier': quality_tier.name
+            }
+        )
+        
+        return EnrollResponse(
+            voiceprint_id=voiceprint_id,
+            embedding=result['template'].tolist(),
+            dimensions=len(result['template']),
+            embedding_version=EMBEDDING_VERSION,
+            clips_used=len(used),
+            clips=[
+                EnrollmentClip(filename=audio[report['index']].filename, **report)
+                for report in clip_reports
+            ]
+        )
+    
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        logger.error(f"Enrollment validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error enrolling voiceprint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post("/verify", response_model=VerifyResponse)
+async def verify(request: VerifyRequest, threshold: float = Query(0.7, ge=0.0, le=1.0)):
+    """
+    Verify an embedding against a voiceprint's enrollment template.
+    
+    Costs one dot product against the template, however many clips were
+    enrolled.
+    
+    Args:
+        request: Voiceprint ID and the embedding to check (from /extract-embedding)
+        threshold: Similarity threshold for a match (default: 0.7)
+    
+    Returns:
+        Similarity to the template and match status
+    """
+    try:
+        template = await run_in_threadpool(
+            get_database().get_template,
+            request.voiceprint_id,
+            request.embedding_version or EMBEDDING_VERSION
+        )
+        if template is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No template for voiceprint {request.voiceprint_id}"
+            )
+        
+        embedding = np.array(request.embedding, dtype=np.float32)
+        if len(embedding) != len(template['embedding']):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Embedding dimension mismatch: {len(embedding)} vs {len(template['embedding'])}"
+            )
+        
+        similarity = get_embedding_service().compute_similarity(embedding, template['embedding'])
+        return VerifyResponse(
+            voiceprint_id=request.voiceprint_id,
+            similarity=similarity,
+            match=similarity >= threshold,
+            threshold=threshold
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error verifying voiceprint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 @app.post("/compute-similarity", response_model=SimilarityResponse)
 async def compute_similarity(request: SimilarityRequest, threshold: float = 0.7):
     """
@@ -278,48 +1041,439 @@ async def compute_similarity(request: SimilarityRequest, threshold: float = 0.7)
 class SearchRequest(BaseModel):
     query_embedding: List[float]
     recording_id: Optional[str] = None  # Exclude this recording from results
+    embedding_version: Optional[str] = None  # Version of query_embedding (default: EMBEDDING_VERSION)
 
 
 @app.post("/recordings/search")
 async def search_recordings(
     request: SearchRequest,
     threshold: float = Query(0.5, ge=0.0, le=1.0),
-    limit: int = Query(3, ge=1, le=10)
+    limit: int = Query(3, ge=1, le=10),
+    since: Optional[datetime] = Query(None)
 ):
     """
     Search recordings by embedding similarity.
     
     Args:
-        request: Query embedding vector and optional recording_id to exclude
+        request: Query embedding vector, optional recording_id to exclude and
+            the embedding_version it came from (only recordings embedded with
+            that version are compared)
         threshold: Minimum similarity threshold (0.0-1.0, default: 0.5)
         limit: Maximum number of results (1-10, default: 3)
+        since: Only search recordings created at or after this time; compacted
+            (cold) months are read only when this reaches back into them
     
     Returns:
         List of matching recordings with similarity scores
     """
     try:
-        db = get_database()
         query_emb = np.array(request.query_embedding, dtype=np.float32)
         
         # Search for matches
-        matches = db.search_by_embedding(query_emb, threshold=threshold, limit=limit * 2)  # Get more to filter
-        
-        # Exclude the current recording if provided
-        if request.recording_id:
-            matches = [m for m in matches if m['recording_id'] != request.recording_id]
-        
-        # Limit to requested number
-        matches = matches[:limit]
+        matches = await run_in_threadpool(
+            nearest_recordings, query_emb, threshold, limit, request.recording_id, since,
+            request.embedding_version or EMBEDDING_VERSION
+        )
         
         return {
             "count": len(matches),
             "matches": matches
         }
+    except EmbeddingVersionNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error searching recordings: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.post("/admin/compact", dependencies=[Depends(require_admin)])
+async def compact_recordings(
+    retention_days: int = Query(HOT_RETENTION_DAYS, ge=0),
+    include_test: bool = Query(True)
+):
+    """
+    Move old and test-mode recordings from the hot table to partitioned Parquet.
+    
+    Args:
+        retention_days: Rows older than this many days are moved (default: RECORDINGS_HOT_RETENTION_DAYS)
+        include_test: Also move test-mode rows regardless of age
+    
+    Returns:
+        Number of rows moved and the months written
+    """
+    try:
+        db = get_database()
+        result = await run_in_threadpool(db.compact, retention_days, include_test)
+        
+        # Shards and cached results mirror the hot table, so drop the rows that were moved out
+        if result['moved']:
+            await run_in_threadpool(reload_search_index)
+        return result
+    except Exception as e:
+        logger.error(f"Error compacting recordings: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post("/admin/warmup", dependencies=[Depends(require_admin)])
+async def warmup_service():
+    """
+    Import the audio/ML stack, open the database and run a dummy forward pass.
+    
+    Returns:
+        Seconds spent per stage (near zero for stages already loaded)
+    """
+    try:
+        return {"status": "warm", "timings": await run_in_threadpool(warmup)}
+    except Exception as e:
+        logger.error(f"Error warming up: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+async def _run_backfill(job: BackfillJob):
+    """Run a backfill, then make its embeddings visible to cached and sharded search."""
+    try:
+        result = await job.run()
+    except Exception as e:
+        logger.error(f"Backfill failed: {str(e)}")
+        return
+    if result['processed']:
+        await run_in_threadpool(reload_search_index)
+    await run_in_threadpool(embedding_version_status, True)
+
+
+@app.post("/admin/backfill", dependencies=[Depends(require_admin)])
+async def start_backfill(
+    batch_size: int = Query(BACKFILL_BATCH_SIZE, ge=1, le=1000),
+    max_rate: float = Query(BACKFILL_MAX_RATE, ge=0.0)
+):
+    """
+    Start re-embedding stored recordings into EMBEDDING_VERSION in the background.
+    
+    Resumes from the checkpoint file if one exists for this version. Clips
+    run through the admission queue at the lowest priority, so live
+    requests are served first.
+    
+    Args:
+        batch_size: Recordings fetched and checkpointed together
+        max_rate: Maximum recordings re-embedded per second (0 = unlimited)
+    
+    Returns:
+        Backfill status
+    """
+    global _backfill_job
+    if _backfill_job is not None and _backfill_job.running:
+        raise HTTPException(status_code=409, detail="Backfill already running")
+    
+    try:
+        _backfill_job = BackfillJob(
+            get_database(),
+            EMBEDDING_VERSION,
+            _reembed_recording,
+            lambda func, *args: _admission.run(
+                func, *args, priority=priority_for_mode('backfill')
+            ),
+            BACKFILL_CHECKPOINT_PATH,
+            batch_size=batch_size,
+            max_rate=max_rate
+        )
+        asyncio.create_task(_run_backfill(_backfill_job))
+        return {**_backfill_job.status(), "running": True}
+    except Exception as e:
+        logger.error(f"Error starting backfill: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.get("/admin/backfill", dependencies=[Depends(require_admin)])
+async def backfill_status():
+    """
+    Report backfill progress, how many recordings have each embedding version
+    and whether EMBEDDING_VERSION is ready to serve (backfill done, 0 failed).
+    """
+    try:
+        versions = await run_in_threadpool(get_database().count_embedding_versions)
+        version_status = await run_in_threadpool(embedding_version_status, True)
+        return {
+            "embedding_version": EMBEDDING_VERSION,
+            "ready": not version_status['problems'],
+            "problems": version_status['problems'],
+            "unsearchable": version_status['unsearchable'],
+            "versions": versions,
+            "job": _backfill_job.status() if _backfill_job is not None else None
+        }
+    except Exception as e:
+        logger.error(f"Error reading backfill status: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post("/admin/backfill/stop", dependencies=[Depends(require_admin)])
+async def stop_backfill():
+    """Stop the running backfill after its current clip (progress is checkpointed)."""
+    if _backfill_job is None or not _backfill_job.running:
+        raise HTTPException(status_code=409, detail="No backfill running")
+    _backfill_job.stop()
+    return {"status": "stopping"}
+
+
+@app.post("/admin/profile/forward", dependencies=[Depends(require_admin)])
+async def arm_forward_profile(passes: int = Query(5, ge=1, le=100)):
+    """
+    Capture a torch profiler trace of the next N forward passes.
+    
+    Fetch the result with GET /admin/profile/forward once they have run.
+    
+    Args:
+        passes: Number of forward passes to capture
+    """
+    profiler = get_embedding_service().profiler
+    try:
+        profiler.arm(passes)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.status()
+
+
+@app.get("/admin/profile/forward", dependencies=[Depends(require_admin)])
+async def get_forward_profile(top: int = Query(30, ge=1, le=500)):
+    """
+    Return the captured forward passes once all have run.
+    
+    Args:
+        top: Number of ops (by self CPU time) to list
+    
+    Returns:
+        Capture status; when complete, also per-pass wall time, the top ops
+        and a Chrome trace ('trace', loadable in speedscope or Perfetto)
+    """
+    profiler = get_embedding_service().profiler
+    status = profiler.status()
+    if not status['complete']:
+        return status
+    return {**status, **await run_in_threadpool(profiler.result, top)}
+
+
+@app.post("/admin/profile/sample", dependencies=[Depends(require_admin)])
+async def sample_profile(
+    seconds: float = Query(5.0, gt=0.0, le=60.0),
+    interval_ms: float = Query(5.0, ge=1.0, le=1000.0),
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    include_idle: bool = Query(False)
+):
+    """
+    Sample the Python stacks of all worker threads for a fixed time.
+    
+    Args:
+        seconds: How long to sample (at most 60)
+        interval_ms: Time between samples
+        format: 'speedscope' (JSON for speedscope.app) or 'collapsed'
+            (text for flamegraph.pl / speedscope)
+        include_idle: Keep threads parked waiting for work
+    """
+    try:
+        counts = await run_in_threadpool(
+            sample_stacks, seconds, interval_ms / 1000.0, include_idle
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "collapsed":
+        return PlainTextResponse(to_collapsed(counts))
+    return to_speedscope(counts, interval_ms / 1000.0)
+
+
+@app.websocket("/ws/stream-embedding")
+async def stream_embedding(websocket: WebSocket):
+    """
+    Stream live microphone audio and receive provisional embeddings.
+    
+    Protocol:
+        1. Client sends a JSON start message:
+           {"type": "start", "sample_rate": 48000, "encoding": "pcm_f32le",
+            "user_id": ..., "mode": ..., "voiceprint_id": ..., "tier": ...,
+            "threshold": 0.5, "limit": 3}
+           encoding is 'pcm_s16le', 'pcm_f32le' (mono), 'webm' or 'ogg' (Opus)
+        2. Client sends audio frames as binary messages while recording
+        3. Server sends {"type": "provisional", ...} with an embedding and
+           identify matches whenever enough new speech has accumulated
+        4. Client sends {"type": "stop"}; server replies {"type": "final", ...}
+           after storing the recording, then closes the socket
+    """
+    await websocket.accept()
+    
+    try:
+        start = await websocket.receive_json()
+        if start.get("type") != "start":
+            raise ValueError("First message must be a start message")
+        
+        quality_tier = get_tier(start.get("tier"))
+        session = StreamingSession(
+            sample_rate=int(start.get("sample_rate", 16000)),
+            encoding=start.get("encoding", "pcm_f32le"),
+            max_bytes=STREAM_MAX_BYTES,
+            max_session_seconds=STREAM_MAX_SECONDS
+        )
+        threshold = float(start.get("threshold", 0.5))
+        limit = int(start.get("limit", 3))
+        # Same bounds as /recordings/search
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"threshold must be between 0 and 1 (got {threshold})")
+        if not 1 <= limit <= 10:
+            raise ValueError(f"limit must be between 1 and 10 (got {limit})")
+        mode = start.get("mode")
+        user_id = start.get("user_id")
+        priority = priority_for_mode(mode)
+    except (ValueError, TypeError, KeyError) as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+        return
+    
+    await websocket.send_json({"type": "ready"})
+    service = get_embedding_service()
+    
+    def provisional(audio: np.ndarray) -> dict:
+        """Embed the audio buffered so far and look up the nearest recordings."""
+        max_val = np.abs(audio).max()
+        if max_val > 0:
+            audio = audio / max_val
+        voiced, _ = _apply_vad(audio, session.target_sr)
+        # Provisional results favour latency over precision
+        embedding = service.extract_embedding(voiced, precision=get_tier("fast").precision)
+        matches = nearest_recordings(embedding, threshold, limit)
+        return {"embedding": embedding.tolist(), "matches": matches}
+    
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive(), timeout=max(session.remaining_seconds(), 0)
+                )
+            except asyncio.TimeoutError:
+                raise StreamLimitExceeded(
+                    f"Stream too long (maximum {STREAM_MAX_SECONDS:g}s)", CLOSE_POLICY
+                )
+            if message["type"] == "websocket.disconnect":
+                logger.info("Stream client disconnected before stop")
+                return
+            
+            if message.get("bytes") is not None:
+                session.feed(message["bytes"])
+                if not session.needs_check():
+                    continue
+                
+                try:
+                    audio = await run_in_threadpool(session.audio)
+                    speech_seconds = await run_in_threadpool(session.speech_seconds, audio)
+                except Exception as e:
+                    # A partial container may not decode yet; try again at the next check
+                    logger.info(f"Provisional decode failed, retrying on next check: {str(e)}")
+                    continue
+                if session.should_emit(speech_seconds):
+                    try:
+                        # Provisional results are only useful if they arrive promptly
+                        result = await _admission.run(
+                            provisional,
+                            audio,
+                            priority=priority,
+                            deadline=_admission.deadline_from_budget(
+                                3 * session.update_interval * 1000
+                            )
+                        )
+                    except AdmissionRejected:
+                        continue
+                    session.mark_emitted(speech_seconds)
+                    await websocket.send_json({
+                        "type": "provisional",
+                        "speech_seconds": speech_seconds,
+                        "truncated": session.truncated,
+                        **result
+                    })
+            elif message.get("text") is not None:
+                if json.loads(message["text"]).get("type") == "stop":
+                    break
+        
+        # Final embedding at the requested tier, stored like /extract-embedding
+        raw_audio = await run_in_threadpool(session.finish)
+        audio, sample_rate = await run_in_threadpool(
+            preprocess_waveform,
+            raw_audio,
+            session.target_sr,
+            session.target_sr,
+            quality_tier.max_duration,
+            quality_tier.res_type
+        )
+        if not validate_audio_quality(audio, sample_rate):
+            raise ValueError("Audio quality too low (insufficient energy or dynamic range)")
+        
+        duration = len(audio) / sample_rate
+        embedding = await _admission.run(
+            service.extract_embedding,
+            audio,
+            quality_tier.precision,
+            priority=priority
+        )
+        
+        recording_id = str(uuid.uuid4())
+        stored = False
+        if (user_id or mode) and (mode != "test" or user_id):
+            # Streamed audio is kept as WAV so the backfill can decode it
+            file_path = None
+            if AUDIO_STORE_DIR:
+                wav = await run_in_threadpool(encode_wav, raw_audio, session.target_sr)
+                file_path = await run_in_threadpool(store_audio, recording_id, "wav", wav)
+            stored = await run_in_threadpool(
+                get_database().insert_recording,
+                recording_id=recording_id,
+                user_id=user_id,
+                filename=f"stream_{recording_id}.{session.encoding}",
+                file_path=file_path,
+                duration_seconds=duration,
+                file_size_bytes=session.bytes_received,
+                sample_rate=sample_rate,
+                audio_format=session.encoding,
+                mode=mode or 'test',
+                embedding=embedding,
+                voiceprint_id=start.get("voiceprint_id") if mode != "test" else None,
+                quality_tier=quality_tier.name,
+                metadata={
+                    'source': 'ml_service_stream',
+                    'model': 'speechbrain/spkrec-ecapa-voxceleb',
+                    'is_test': mode == 'test'
+                }
+            )
+        
+        await websocket.send_json({
+            "type": "final",
+            "recording_id": recording_id if stored else None,
+            "embedding": embedding.tolist(),
+            "dimensions": len(embedding),
+            "audio_duration": duration,
+            "quality_tier": quality_tier.name,
+            "embedding_version": EMBEDDING_VERSION,
+            "truncated": session.truncated
+        })
+        await websocket.close()
+    
+    except WebSocketDisconnect:
+        logger.info("Stream client disconnected")
+    except StreamLimitExceeded as e:
+        logger.warning(f"Closing stream: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=e.close_code)
+    except AdmissionRejected as e:
+        await websocket.send_json({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+        await websocket.close(code=1013)
+    except EmbeddingVersionNotReady as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1013)
+    except ValueError as e:
+        logger.error(f"Stream validation error: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+    except Exception as e:
+        logger.error(f"Error streaming embedding: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": f"Internal server error: {str(e)}"})
+        await websocket.close(code=1011)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -5,19 +5,52 @@ Extracts 192-dimensional speaker embeddings from audio.
 
 import numpy as np
 import os
-os.environ.setdefault("TORCHAUDIO_BACKEND", "soundfile")
-
-import torchaudio  # ensure present before SpeechBrain import
-if not hasattr(torchaudio, "list_audio_backends"):
-    torchaudio.list_audio_backends = lambda: []
-
-from speechbrain.inference.speaker import EncoderClassifier
-from typing import Optional
+import threading
+from contextlib import nullcontext
+from typing import Any, Optional
 import logging
+from utils.profiling import ForwardProfiler
 
 logger = logging.getLogger(__name__)
 
 
+def _import_encoder_classifier():
+    """
+    Import SpeechBrain's EncoderClassifier (torch, torchaudio, speechbrain).
+    
+    Deferred until the model is first loaded so that importing this module
+    (e.g. for compute_similarity) does not pay for the ML stack.
+    """
+    os.environ.setdefault("TORCHAUDIO_BACKEND", "soundfile")
+    
+    import torchaudio  # ensure present before SpeechBrain import
+    if not hasattr(torchaudio, "list_audio_backends"):
+        torchaudio.list_audio_backends = lambda: []
+    
+    from speechbrain.inference.speaker import EncoderClassifier
+    return EncoderClassifier
+
+
+def cpu_supports_bf16() -> bool:
+    """
+    Whether this CPU runs bfloat16 natively (AVX512-BF16/AMX, or AVX512BW
+    on x86; the BF16 extension on ARM).
+    
+    Without it, CPU autocast still works but emulates bf16 and is slower
+    than float32, so the fast tier should not use it.
+    """
+    import torch
+    
+    try:
+        return bool(
+            torch.backends.mkldnn.is_available()
+            and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+        )
+    except (AttributeError, RuntimeError):
+        # Older torch builds without the oneDNN capability check
+        return False
+
+
 class VoiceprintService:
     """
     Service for extracting speaker embeddings using ECAPA-TDNN model.
@@ -25,32 +58,42 @@ class VoiceprintService:
     
     def __init__(self):
         """Initialize the service. Model loads lazily on first use."""
-        self.model: Optional[EncoderClassifier] = None
-        self._model_loading = False
+        self.model: Optional[Any] = None  # speechbrain EncoderClassifier
+        self._model_lock = threading.Lock()  # Concurrent first requests wait for one load
+        self.bf16_supported: Optional[bool] = None  # Checked when the model loads
+        self.profiler = ForwardProfiler()  # Armed via /admin/profile/forward
         logger.info("VoiceprintService initialized (model will load on first request)")
     
     def _load_model(self):
         """Load the model if not already loaded (lazy loading)."""
-        if self.model is None and not self._model_loading:
+        if self.model is not None:
+            return
+        with self._model_lock:
+            if self.model is not None:
+                return
             try:
-                self._model_loading = True
+                EncoderClassifier = _import_encoder_classifier()
                 logger.info("Loading ECAPA-TDNN model from Hugging Face (first request)...")
                 self.model = EncoderClassifier.from_hf_source(
                     "speechbrain/spkrec-ecapa-voxceleb"
                 )
+                self.bf16_supported = cpu_supports_bf16()
+                if not self.bf16_supported:
+                    logger.warning("CPU has no native bfloat16 support; bfloat16 requests run in float32")
                 logger.info("Model loaded successfully")
-                self._model_loading = False
             except Exception as e:
-                self._model_loading = False
                 logger.error(f"Failed to load model: {str(e)}")
                 raise
     
-    def extract_embedding(self, audio: np.ndarray) -> np.ndarray:
+    def extract_embedding(self, audio: np.ndarray, precision: str = "float32") -> np.ndarray:
         """
         Extract speaker embedding from audio.
         
         Args:
             audio: Preprocessed audio array (1D numpy array, 16kHz)
+            precision: 'float32' or 'bfloat16' (CPU autocast, faster on
+                CPUs with bf16 support at a small accuracy cost; runs in
+                float32 on CPUs without it)
         
         Returns:
             192-dimensional embedding vector
@@ -64,15 +107,22 @@ class VoiceprintService:
             if audio.ndim == 1:
                 audio = audio.unsqueeze(0) if hasattr(audio, 'unsqueeze') else np.expand_dims(audio, 0)
             
+            import torch
+            
             # Convert to tensor if needed
             if isinstance(audio, np.ndarray):
-                import torch
                 audio_tensor = torch.from_numpy(audio).float()
             else:
                 audio_tensor = audio
             
-            # Extract embedding
-            embedding = self.model.encode_batch(audio_tensor)
+            # Extract embedding (profiled only when a capture was requested)
+            profile = self.profiler.capture() if self.profiler.armed else nullcontext()
+            with profile, torch.inference_mode(), torch.autocast(
+                "cpu", dtype=torch.bfloat16,
+                enabled=precision == "bfloat16" and bool(self.bf16_supported)
+            ):
+                embedding = self.model.encode_batch(audio_tensor)
+            embedding = embedding.float()
             
             # Convert to numpy and flatten
             if hasattr(embedding, 'numpy'):
@@ -94,6 +144,18 @@ class VoiceprintService:
             logger.error(f"Failed to extract embedding: {str(e)}")
             raise ValueError(f"Embedding extraction failed: {str(e)}")
     
+    def warmup(self, seconds: float = 3.0) -> None:
+        """
+        Import the ML stack, load the model and run one dummy forward pass.
+        
+        Called before traffic arrives so the first request does not pay for
+        imports, weight loading or first-call allocation.
+        
+        Args:
+            seconds: Length of the silent 16kHz input used for the forward pass
+        """
+        self.extract_embedding(np.zeros(int(16000 * seconds), dtype=np.float32))
+    
     def compute_similarity(self, emb1: np.ndarray, emb2: np.ndarray) -> float:
         """
         Compute cosine similarity between two embeddings.
@@ -117,19 +179,24 @@ class VoiceprintService:
         
         return float(similarity)
     
-    def batch_extract(self, audio_batch: list[np.ndarray]) -> list[np.ndarray]:
+    def batch_extract(
+        self,
+        audio_batch: list[np.ndarray],
+        precision: str = "float32"
+    ) -> list[np.ndarray]:
         """
         Extract embeddings for multiple audio samples.
         
         Args:
             audio_batch: List of preprocessed audio arrays
+            precision: Model precision (see extract_embedding)
         
         Returns:
             List of embedding vectors
         """
         embeddings = []
         for audio in audio_batch:
-            embedding = self.extract_embedding(audio)
+            embedding = self.extract_embedding(audio, precision=precision)
             embeddings.append(embedding)
         return embeddings
 
@@ -0,0 +1,60 @@
+"""
+Sync the SpeechBrain model cache with Cloud Storage (or a local mirror).
+Only files whose checksum changed are transferred; a manifest.json is
+written alongside the files and verified by the service at startup.
+
+Usage:
+    python sync_models.py push [--local-dir ./model_cache]
+    python sync_models.py pull [--local-dir ./model_cache]
+    python sync_models.py verify [--local-dir ./model_cache]
+    python sync_models.py pull --backend-dir /mnt/models   # local stand-in for the bucket
+"""
+
+import argparse
+import logging
+import sys
+from utils.model_sync import GCSBackend, LocalBackend, push, pull, verify_manifest
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUCKET_NAME = "app-streamdisc-ml-models"
+MODEL_GCS_PATH = "ecapa-voxceleb/"
+LOCAL_MODEL_DIR = "./model_cache"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["push", "pull", "verify"])
+    parser.add_argument("--local-dir", default=LOCAL_MODEL_DIR)
+    parser.add_argument("--bucket", default=BUCKET_NAME)
+    parser.add_argument("--prefix", default=MODEL_GCS_PATH)
+    parser.add_argument("--backend-dir", help="Use a local directory instead of Cloud Storage")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        problems = verify_manifest(args.local_dir)
+        for problem in problems:
+            logger.error(problem)
+        if problems:
+            sys.exit(1)
+        logger.info(f"✓ {args.local_dir} matches its manifest")
+        return
+
+    if args.backend_dir:
+        backend = LocalBackend(args.backend_dir)
+    else:
+        backend = GCSBackend(args.bucket, args.prefix)
+
+    if args.command == "push":
+        result = push(args.local_dir, backend, workers=args.workers, retries=args.retries)
+        logger.info(f"✓ Uploaded {len(result['uploaded'])} files ({len(result['skipped'])} unchanged) to {backend!r}")
+    else:
+        result = pull(args.local_dir, backend, workers=args.workers, retries=args.retries)
+        logger.info(f"✓ Downloaded {len(result['downloaded'])} files ({len(result['skipped'])} up to date) from {backend!r}")
+
+
+if __name__ == "__main__":
+    main()
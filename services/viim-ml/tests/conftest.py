@@ -0,0 +1,6 @@
+"""Make the service modules (main, utils, models) importable from tests."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
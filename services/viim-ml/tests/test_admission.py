@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from utils.admission import AdmissionController
+
+
+async def occupy(controller, seconds):
+    task = asyncio.create_task(
+        controller.run(time.sleep, seconds, priority=0, deadline=time.monotonic() + 10)
+    )
+    await asyncio.sleep(0.01)
+    return task
+
+
+def test_expired_waiters_do_not_fill_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, initial_service_time=0.05)
+        busy = await occupy(controller, 0.5)
+
+        first = asyncio.create_task(
+            controller.run(time.sleep, 0.01, priority=2, deadline=time.monotonic() + 10)
+        )
+        await asyncio.sleep(0.01)
+        # Passes the admission estimate, then times out while queued
+        expiring = asyncio.create_task(
+            controller.run(time.sleep, 0.01, priority=2, deadline=time.monotonic() + 0.16)
+        )
+        await asyncio.gather(expiring, return_exceptions=True)
+        assert expiring.exception().reason == 'expired'
+
+        second = asyncio.create_task(
+            controller.run(time.sleep, 0.01, priority=2, deadline=time.monotonic() + 10)
+        )
+        await asyncio.sleep(0.01)
+        assert controller.stats()['queued'] == 2
+        assert not first.done() and not second.done()
+
+        await asyncio.gather(busy, first, second)
+        assert 'queue_full' not in controller.stats()['shed_by_reason']
+        assert 'preempted' not in controller.stats()['shed_by_reason']
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiters_leave_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, initial_service_time=0.05)
+        busy = await occupy(controller, 0.3)
+
+        abandoned = asyncio.create_task(
+            controller.run(time.sleep, 0.01, priority=2, deadline=time.monotonic() + 10)
+        )
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        await asyncio.gather(abandoned, return_exceptions=True)
+        assert len(controller._queue) == 0
+
+        result = await controller.run(
+            lambda: 'ran', priority=2, deadline=time.monotonic() + 10
+        )
+        assert result == 'ran'
+        await busy
+        assert controller.stats()['shed_total'] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from utils.audio_processor import apply_vad
+
+SR = 16000
+
+
+def signal(*segments):
+    """Concatenate ('tone' | 'silence', seconds) segments into one waveform."""
+    parts = []
+    for kind, seconds in segments:
+        t = np.arange(int(seconds * SR)) / SR
+        parts.append(0.5 * np.sin(2 * np.pi * 220 * t) if kind == 'tone' else np.zeros_like(t))
+    return np.concatenate(parts).astype(np.float32)
+
+
+def test_internal_silence_between_bursts_is_removed():
+    audio = signal(('tone', 1.0), ('silence', 1.0), ('tone', 1.0))
+
+    voiced, stats = apply_vad(audio, SR)
+
+    assert stats['segments'] == 2
+    assert len(voiced) / SR == pytest.approx(2.0, abs=0.1)
+    assert stats['removed_fraction'] == pytest.approx(1 / 3, abs=0.05)
+    # What is left is the tone, not the silence
+    assert np.mean(np.abs(voiced) > 0.01) > 0.9
+
+
+def test_gaps_shorter_than_min_silence_are_kept():
+    audio = signal(('tone', 1.0), ('silence', 0.1), ('tone', 1.0))
+
+    voiced, stats = apply_vad(audio, SR, min_silence_ms=200)
+
+    assert stats['segments'] == 1
+    assert len(voiced) == len(audio)
+
+    # The same gap counts as silence once it is longer than min_silence_ms
+    _, stats = apply_vad(audio, SR, min_silence_ms=50)
+    assert stats['segments'] == 2
+
+
+def test_bursts_shorter_than_min_speech_are_dropped():
+    audio = signal(
+        ('tone', 1.0), ('silence', 0.5), ('tone', 0.05), ('silence', 0.5), ('tone', 1.0)
+    )
+
+    voiced, stats = apply_vad(audio, SR, min_speech_ms=100)
+
+    assert stats['segments'] == 2
+    assert len(voiced) / SR == pytest.approx(2.0, abs=0.1)
+
+    _, stats = apply_vad(audio, SR, min_speech_ms=20)
+    assert stats['segments'] == 3
+
+
+def test_too_little_speech_returns_the_original_audio():
+    audio = signal(('tone', 0.2), ('silence', 2.0))
+
+    voiced, stats = apply_vad(audio, SR, min_output_s=0.5)
+
+    assert voiced is audio
+    assert stats['removed_fraction'] == 0.0
+    assert stats['segments'] == 1
@@ -0,0 +1,137 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils.backfill import BackfillJob, read_checkpoint
+
+
+class MemoryDatabase:
+    """The slice of RecordingDatabase a BackfillJob uses, kept in memory."""
+
+    def __init__(self, recording_ids, audio_dir):
+        start = datetime(2024, 1, 1)
+        self.rows = []
+        for index, recording_id in enumerate(recording_ids):
+            path = audio_dir / f"{recording_id}.wav"
+            path.write_bytes(recording_id.encode())
+            self.rows.append({
+                'recording_id': recording_id,
+                'created_at': start + timedelta(seconds=index),
+                'file_path': str(path),
+                'quality_tier': None,
+            })
+        self.embeddings = {}
+
+    def get_backfill_batch(self, embedding_version, after=None, limit=16):
+        pending = [
+            row for row in self.rows
+            if (row['recording_id'], embedding_version) not in self.embeddings
+            and (after is None or (row['created_at'], row['recording_id']) > after)
+        ]
+        return pending[:limit]
+
+    def get_recording(self, recording_id):
+        return next((dict(row) for row in self.rows if row['recording_id'] == recording_id), None)
+
+    def upsert_version_embedding(self, recording_id, embedding_version, embedding, metadata=None):
+        self.embeddings[(recording_id, embedding_version)] = embedding
+
+
+async def submit(func, *args):
+    return func(*args)
+
+
+def run_job(db, checkpoint, embed):
+    job = BackfillJob(db, 'v2', embed, submit, str(checkpoint), batch_size=2, max_rate=0)
+    return asyncio.run(job.run())
+
+
+def test_failed_rows_are_kept_and_retried(tmp_path):
+    db = MemoryDatabase(['r0', 'r1', 'r2', 'r3'], tmp_path)
+    checkpoint = tmp_path / 'checkpoint.json'
+    broken = {'r1', 'r2'}
+
+    def embed(audio_bytes, row):
+        if row['recording_id'] in broken:
+            raise ValueError("decoder crashed")
+        return np.ones(4, dtype=np.float32)
+
+    status = run_job(db, checkpoint, embed)
+    assert status['completed']
+    assert sorted(status['failed_ids']) == ['r1', 'r2']
+    assert json.loads(checkpoint.read_text())['failed_ids'] == status['failed_ids']
+
+    # The cursor is past the failed rows; the next run retries them anyway
+    broken.discard('r1')
+    status = run_job(db, checkpoint, embed)
+    assert status['failed_ids'] == ['r2']
+    assert ('r1', 'v2') in db.embeddings
+
+    broken.clear()
+    status = run_job(db, checkpoint, embed)
+    assert status['failed_ids'] == []
+    assert len(db.embeddings) == 4
+
+
+def test_checkpoints_without_failed_ids_still_load(tmp_path):
+    checkpoint = tmp_path / 'checkpoint.json'
+    checkpoint.write_text(json.dumps({'embedding_version': 'v2', 'cursor': None, 'failed': 3}))
+
+    assert read_checkpoint(str(checkpoint), 'v2')['failed_ids'] == []
+    assert read_checkpoint(str(checkpoint), 'v3') is None
+
+
+def version_bump(monkeypatch, tmp_path, rows):
+    """Point main at a real database holding v1 rows and switch it to v2."""
+    import main
+    from utils.database import RecordingDatabase
+
+    db = RecordingDatabase(str(tmp_path / "voiceprints.db"), str(tmp_path / "cold"))
+    for recording_id, has_audio in rows.items():
+        file_path = None
+        if has_audio:
+            file_path = tmp_path / f"{recording_id}.wav"
+            file_path.write_bytes(b"audio")
+        db.insert_recording(
+            recording_id=recording_id, user_id="u1", filename=f"{recording_id}.wav",
+            file_path=file_path and str(file_path), duration_seconds=3.0, file_size_bytes=5,
+            sample_rate=16000, audio_format="wav", mode="identify",
+            embedding=np.ones(4, dtype=np.float32), embedding_version="v1"
+        )
+    monkeypatch.setattr(main, "_database", db)
+    monkeypatch.setattr(main, "_backfill_job", None)
+    monkeypatch.setattr(main, "_embedding_version_status", None)
+    monkeypatch.setattr(main, "_search_cache", main.SearchResultCache())
+    monkeypatch.setattr(main, "SEARCH_SHARDS", 0)
+    monkeypatch.setattr(main, "EMBEDDING_VERSION", "v2")
+    monkeypatch.setattr(main, "EMBEDDING_VERSION_STRICT", True)
+    monkeypatch.setattr(main, "BACKFILL_CHECKPOINT_PATH", str(tmp_path / "checkpoint.json"))
+    return main, db
+
+
+def test_rows_without_audio_do_not_block_a_version_bump(monkeypatch, tmp_path):
+    main, db = version_bump(monkeypatch, tmp_path, {"old-a": False, "old-b": False, "stored": True})
+    query = np.ones(4, dtype=np.float32)
+
+    # The stored row can still be re-embedded, so v2 is held back until it is
+    assert main.embedding_version_status()["problems"]
+    with pytest.raises(main.EmbeddingVersionNotReady):
+        main.nearest_recordings(query, 0.5, 10, embedding_version="v2")
+
+    status = run_job(db, main.BACKFILL_CHECKPOINT_PATH, lambda audio_bytes, row: np.ones(4, dtype=np.float32))
+    assert status["skipped"] == 2
+
+    version_status = main.embedding_version_status(refresh=True)
+    assert version_status == {"problems": [], "unsearchable": 2}
+    matches = main.nearest_recordings(query, 0.5, 10, embedding_version="v2")
+    assert [m["recording_id"] for m in matches] == ["stored"]
+
+
+def test_version_bump_without_any_stored_audio_serves_immediately(monkeypatch, tmp_path):
+    main, _ = version_bump(monkeypatch, tmp_path, {"old-a": False, "old-b": False})
+
+    assert main.embedding_version_status() == {"problems": [], "unsearchable": 2}
+    assert main.nearest_recordings(np.ones(4, dtype=np.float32), 0.5, 10, embedding_version="v2") == []
@@ -0,0 +1,130 @@
+import glob
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from utils.database import RecordingDatabase, _as_stored_time
+
+
+def cold_database(tmp_path, months):
+    # _cold_files only touches the filesystem, so no connection is needed
+    db = RecordingDatabase.__new__(RecordingDatabase)
+    db.cold_path = str(tmp_path)
+    for month in months:
+        partition = tmp_path / f"month={month}" / "mode=identify"
+        partition.mkdir(parents=True)
+        (partition / "part_0.parquet").write_bytes(b"")
+    return db
+
+
+def test_aware_since_is_converted_to_stored_time():
+    since = datetime(2024, 5, 1, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+    converted = _as_stored_time(since)
+
+    assert converted.tzinfo is None
+    assert converted == datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    naive = datetime(2024, 5, 1)
+    assert _as_stored_time(naive) is naive
+    assert _as_stored_time(None) is None
+
+
+def test_cold_files_accept_aware_since(tmp_path):
+    db = cold_database(tmp_path, ["2024-03", "2024-04", "2024-06"])
+
+    files = db._cold_files(datetime(2024, 4, 15, tzinfo=timezone.utc))
+
+    assert [f.split("month=")[1][:7] for f in files] == ["2024-04", "2024-06"]
+
+
+def test_recordings_source_reads_cold_tier_for_aware_since(tmp_path):
+    db = cold_database(tmp_path, ["2024-04"])
+
+    source, params = db._recordings_source(datetime(2024, 4, 1, tzinfo=timezone.utc))
+
+    assert "read_parquet" in source
+    assert len(params[0]) == 1
+
+
+class FailingDelete:
+    """Cursor proxy whose DELETE fails, as if the disk filled up mid-compaction."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, *args):
+        if sql.strip().startswith("DELETE"):
+            raise RuntimeError("disk full")
+        return self._cursor.execute(sql, *args)
+
+
+def populated_database(tmp_path):
+    db = RecordingDatabase(str(tmp_path / "voiceprints.db"), str(tmp_path / "cold"))
+    rows = {
+        "jan-a": datetime(2024, 1, 10), "jan-b": datetime(2024, 1, 20),
+        "mar-a": datetime(2024, 3, 5), "recent": datetime.now(),
+    }
+    for recording_id, created_at in rows.items():
+        db.insert_recording(
+            recording_id=recording_id, user_id="u1", filename=f"{recording_id}.wav",
+            file_path=None, duration_seconds=3.0, file_size_bytes=100, sample_rate=16000,
+            audio_format="wav", mode="identify", embedding=np.ones(8, dtype=np.float32)
+        )
+        db.conn.execute(
+            "UPDATE recordings SET created_at = ? WHERE recording_id = ?", [created_at, recording_id]
+        )
+    return db
+
+
+def hot_count(db):
+    return db.conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+
+def test_compact_moves_old_rows_to_month_partitions(tmp_path):
+    db = populated_database(tmp_path)
+
+    result = db.compact(retention_days=30, include_test=False)
+
+    assert result["moved"] == 3 and result["months"] == ["2024-01", "2024-03"]
+    assert hot_count(db) == 1
+    since_march = db.search_by_embedding(np.ones(8, dtype=np.float32), threshold=0.5, since=datetime(2024, 3, 1))
+    assert sorted(m["recording_id"] for m in since_march) == ["mar-a", "recent"]
+    since_jan = db.search_by_embedding(np.ones(8, dtype=np.float32), threshold=0.5, since=datetime(2024, 1, 1))
+    assert sorted(m["recording_id"] for m in since_jan) == ["jan-a", "jan-b", "mar-a", "recent"]
+    # Month pruning: January's partition is not even opened for a March query
+    assert all("month=2024-03" in path for path in db._cold_files(datetime(2024, 3, 1)))
+    assert not glob.glob(str(tmp_path / "cold" / ".staging-*"))
+
+
+def test_failed_compaction_leaves_no_cold_files(tmp_path, monkeypatch):
+    db = populated_database(tmp_path)
+    real_cursor = db._cursor
+
+    @contextmanager
+    def failing_cursor():
+        with real_cursor() as cursor:
+            yield FailingDelete(cursor)
+
+    monkeypatch.setattr(db, "_cursor", failing_cursor)
+    with pytest.raises(RuntimeError, match="disk full"):
+        db.compact(retention_days=30, include_test=False)
+    monkeypatch.undo()
+
+    assert hot_count(db) == 4
+    assert not glob.glob(str(tmp_path / "cold" / "**" / "*.parquet"), recursive=True)
+    found = db.search_by_embedding(np.ones(8, dtype=np.float32), threshold=0.5, since=datetime(2024, 1, 1))
+    assert len(found) == 4
+
+
+def test_compaction_interrupted_after_commit_is_published_on_open(tmp_path, monkeypatch):
+    db = populated_database(tmp_path)
+    monkeypatch.setattr(db, "_publish_staging", lambda staging: None)  # Crash right after COMMIT
+    db.compact(retention_days=30, include_test=False)
+    db.conn.close()
+
+    reopened = RecordingDatabase(str(tmp_path / "voiceprints.db"), str(tmp_path / "cold"))
+
+    found = reopened.search_by_embedding(np.ones(8, dtype=np.float32), threshold=0.5, since=datetime(2024, 1, 1))
+    assert sorted(m["recording_id"] for m in found) == ["jan-a", "jan-b", "mar-a", "recent"]
+    assert not glob.glob(str(tmp_path / "cold" / ".staging-*"))
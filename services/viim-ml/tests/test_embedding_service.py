@@ -0,0 +1,34 @@
+import sys
+import types
+
+import pytest
+
+from models.embedding_service import cpu_supports_bf16
+
+
+def fake_torch(monkeypatch, mkldnn_available, bf16_check):
+    module = types.ModuleType('torch')
+    module.backends = types.SimpleNamespace(
+        mkldnn=types.SimpleNamespace(is_available=lambda: mkldnn_available)
+    )
+    module.ops = types.SimpleNamespace(mkldnn=types.SimpleNamespace())
+    if bf16_check is not None:
+        module.ops.mkldnn._is_mkldnn_bf16_supported = bf16_check
+    monkeypatch.setitem(sys.modules, 'torch', module)
+
+
+@pytest.mark.parametrize('mkldnn_available, native_bf16, expected', [
+    (True, True, True),
+    (True, False, False),
+    (False, True, False),
+])
+def test_bf16_support_follows_onednn(monkeypatch, mkldnn_available, native_bf16, expected):
+    fake_torch(monkeypatch, mkldnn_available, lambda: native_bf16)
+
+    assert cpu_supports_bf16() is expected
+
+
+def test_torch_without_the_capability_check_falls_back_to_float32(monkeypatch):
+    fake_torch(monkeypatch, True, None)
+
+    assert cpu_supports_bf16() is False
@@ -0,0 +1,87 @@
+"""Quality weighting of enrollment clips."""
+
+import numpy as np
+import pytest
+from utils.audio_processor import batch_quality_metrics
+from utils.enrollment import build_template, quality_weights
+
+SR = 16000
+
+
+def speech_like(seconds: float = 3.0, level: float = 0.1, seed: int = 0) -> np.ndarray:
+    """Harmonic 140Hz source through three formants, in syllables with pauses."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SR * seconds)) / SR
+    voiced = sum(
+        np.exp(-0.5 * ((k * 140 - formant) / 300) ** 2) * np.sin(2 * np.pi * k * 140 * t)
+        for k in range(1, 25)
+        for formant in (600, 1500, 2500)
+    )
+    syllables = np.clip(np.sin(2 * np.pi * 2 * t), 0, None) ** 2
+    audio = level * voiced / np.abs(voiced).max() * syllables
+    return (audio + 0.001 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def hiss(seconds: float = 3.0, seed: int = 1) -> np.ndarray:
+    return (0.1 * np.random.default_rng(seed).standard_normal(int(SR * seconds))).astype(np.float32)
+
+
+def hum(seconds: float = 3.0) -> np.ndarray:
+    t = np.arange(int(SR * seconds)) / SR
+    return (0.3 * np.sin(2 * np.pi * 50 * t)).astype(np.float32)
+
+
+def test_noise_weighs_less_than_speech():
+    weights = quality_weights(batch_quality_metrics([speech_like(), hiss(), hum()], SR))
+    assert weights[0] > 0.1
+    assert weights[1] < weights[0]
+    assert weights[2] < weights[0]
+
+
+def test_noisy_speech_weighs_less_than_clean_speech():
+    clean = speech_like()
+    noisy = clean + 0.5 * hiss()
+    weights = quality_weights(batch_quality_metrics([clean, noisy], SR))
+    assert weights[1] < weights[0]
+
+
+def test_near_silent_clip_gets_zero_weight():
+    silent = speech_like(level=1e-4) * 0.01
+    assert quality_weights(batch_quality_metrics([silent], SR))[0] == 0.0
+
+
+def test_metrics_match_per_clip_computation():
+    clips = [speech_like(2.0), speech_like(3.5, seed=2), hiss(1.5)]
+    batched = batch_quality_metrics(clips, SR)
+    for index, clip in enumerate(clips):
+        single = batch_quality_metrics([clip], SR)
+        for key, values in batched.items():
+            assert np.isclose(values[index], single[key][0], rtol=1e-4, atol=1e-6), key
+
+
+def test_template_ignores_zero_weight_clips():
+    good = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    bad = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+    template, similarities = build_template(np.stack([good, bad]), np.array([1.0, 0.0]))
+    assert np.allclose(template, good)
+    assert similarities[0] > similarities[1]
+
+
+def test_clips_failing_the_intake_probe_are_never_decoded(monkeypatch):
+    import main
+    from utils.audio_processor import encode_wav
+    from utils.quality_tiers import get_tier
+
+    too_long = encode_wav(speech_like(seconds=12.0), SR)
+    silent = encode_wav(np.zeros(3 * SR, dtype=np.float32), SR)
+    decoded = []
+
+    def decode_spy(audio_bytes):
+        decoded.append(audio_bytes)
+        raise ValueError("decode stopped by test")
+
+    monkeypatch.setattr(main, "decode_audio", decode_spy)
+
+    with pytest.raises(ValueError, match="No enrollment clip"):
+        main._enroll_clips([too_long, silent], get_tier("accurate"), use_vad=False)
+    assert decoded == []
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+from import_report import DEFAULT_BUDGET_MS, HEAVY_MODULES, measure
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_main_stays_within_budget():
+    _, modules = measure("main")
+    total_ms = sum(self_us for _, self_us, _, _ in modules) / 1000
+
+    assert total_ms <= DEFAULT_BUDGET_MS, f"import main took {total_ms:.1f}ms"
+    heavy = {name.split(".")[0] for name, _, _, _ in modules} & set(HEAVY_MODULES)
+    assert not heavy, f"{', '.join(sorted(heavy))} should load lazily"
+
+
+def test_import_main_leaves_model_stack_unloaded():
+    # Fresh interpreter: this test process may already have torch loaded
+    result = subprocess.run(
+        [sys.executable, "-c", "import json, sys, main; print(json.dumps(sorted(sys.modules)))"],
+        cwd=SERVICE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded = {name.split(".")[0] for name in json.loads(result.stdout.splitlines()[-1])}
+
+    eager = loaded & {"torch", "speechbrain", "librosa"}
+    assert not eager, f"{', '.join(sorted(eager))} loaded by import main"
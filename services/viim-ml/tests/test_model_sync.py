@@ -0,0 +1,51 @@
+import json
+import os
+
+from utils.model_sync import LocalBackend, MANIFEST_NAME, pull, push
+
+
+def publish(tmp_path, files):
+    source = tmp_path / "source"
+    source.mkdir()
+    for name, data in files.items():
+        (source / name).write_bytes(data)
+    backend = LocalBackend(str(tmp_path / "bucket"))
+    push(str(source), backend, workers=1, backoff=0)
+    return backend
+
+
+def test_pull_skips_untouched_files(tmp_path):
+    backend = publish(tmp_path, {"embedding_model.ckpt": b"weights" * 100})
+    target = str(tmp_path / "target")
+
+    assert pull(target, backend, workers=1, backoff=0)["downloaded"] == ["embedding_model.ckpt"]
+    assert pull(target, backend, workers=1, backoff=0)["skipped"] == ["embedding_model.ckpt"]
+
+
+def test_pull_replaces_same_size_corrupted_file(tmp_path):
+    original = b"weights" * 100
+    backend = publish(tmp_path, {"embedding_model.ckpt": original})
+    target = tmp_path / "target"
+    pull(str(target), backend, workers=1, backoff=0)
+
+    path = target / "embedding_model.ckpt"
+    path.write_bytes(b"X" + original[1:])  # Same size, different content
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    result = pull(str(target), backend, workers=1, backoff=0)
+
+    assert result["downloaded"] == ["embedding_model.ckpt"]
+    assert path.read_bytes() == original
+
+
+def test_local_manifest_records_mtimes_but_remote_does_not(tmp_path):
+    backend = publish(tmp_path, {"hyperparams.yaml": b"a: 1\n"})
+    target = tmp_path / "target"
+    pull(str(target), backend, workers=1, backoff=0)
+
+    local = json.loads((target / MANIFEST_NAME).read_text())
+    remote = json.loads(backend.read_bytes(MANIFEST_NAME))
+
+    assert local["files"]["hyperparams.yaml"]["mtime_ns"] == (target / "hyperparams.yaml").stat().st_mtime_ns
+    assert "mtime_ns" not in remote["files"]["hyperparams.yaml"]
@@ -0,0 +1,97 @@
+import json
+import sys
+import threading
+import types
+
+import pytest
+
+from utils.profiling import ForwardProfiler
+
+
+class FakeProfile:
+    """Stands in for torch.profiler.profile; fails where the test asks it to."""
+
+    started = 0
+    fail_on = None
+
+    def __init__(self, **kwargs):
+        pass
+
+    def start(self):
+        if FakeProfile.fail_on == 'start':
+            raise RuntimeError("profiler already enabled on this thread")
+        FakeProfile.started += 1
+
+    def stop(self):
+        if FakeProfile.fail_on == 'stop':
+            raise RuntimeError("profiler not running")
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': [{'name': 'aten::conv1d', 'ph': 'X', 'ts': 1, 'dur': 5}]}, f)
+
+    def key_averages(self):
+        return [types.SimpleNamespace(key='aten::conv1d', count=1, self_cpu_time_total=10.0, cpu_time_total=20.0)]
+
+
+@pytest.fixture(autouse=True)
+def fake_torch_profiler(monkeypatch):
+    module = types.ModuleType('torch.profiler')
+    module.profile = FakeProfile
+    module.ProfilerActivity = types.SimpleNamespace(CPU='cpu')
+    monkeypatch.setitem(sys.modules, 'torch', types.ModuleType('torch'))
+    monkeypatch.setitem(sys.modules, 'torch.profiler', module)
+    FakeProfile.started = 0
+    FakeProfile.fail_on = None
+
+
+def forward(profiler):
+    with profiler.capture():
+        return 'embedding'
+
+
+def test_captures_armed_passes():
+    profiler = ForwardProfiler()
+    profiler.arm(2)
+
+    assert [forward(profiler) for _ in range(3)] == ['embedding'] * 3
+    assert profiler.status()['captured'] == 2
+    assert profiler.status()['complete']
+    assert profiler.result()['top_ops'][0]['name'] == 'aten::conv1d'
+
+
+@pytest.mark.parametrize('fail_on', ['start', 'stop'])
+def test_profiler_failure_does_not_fail_the_pass(fail_on):
+    FakeProfile.fail_on = fail_on
+    profiler = ForwardProfiler()
+    profiler.arm(1)
+
+    assert forward(profiler) == 'embedding'
+    assert profiler.status()['captured'] == 0
+    assert profiler.status()['complete']
+
+
+def test_overlapping_passes_are_profiled_one_at_a_time():
+    profiler = ForwardProfiler()
+    profiler.arm(2)
+    inside = threading.Event()
+    release = threading.Event()
+
+    def slow_pass():
+        with profiler.capture():
+            inside.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=slow_pass)
+    worker.start()
+    inside.wait(5)
+    # Runs while the first capture is open: unprofiled, slot kept
+    assert forward(profiler) == 'embedding'
+    assert FakeProfile.started == 1
+    assert profiler.status()['remaining'] == 1
+    release.set()
+    worker.join()
+
+    forward(profiler)
+    assert FakeProfile.started == 2
+    assert profiler.status()['captured'] == 2
@@ -0,0 +1,88 @@
+import numpy as np
+
+from utils.search_cache import SearchResultCache
+
+
+def cached_search(cache, query, matches, generation):
+    key = cache.key(query, 0.5, 10)
+    cache.put(key, query, 0.5, 10, None, None, None, matches, generation=generation)
+    return cache.get(key)
+
+
+def test_put_is_skipped_after_a_concurrent_insert():
+    cache = SearchResultCache()
+    query = np.ones(4, dtype=np.float32)
+
+    generation = cache.generation  # Search starts
+    cache.on_insert({'recording_id': 'new'}, query)  # Inserted before the search returns
+
+    assert cached_search(cache, query, [], generation) is None
+    assert cache.stats()['stale_puts'] == 1
+
+
+def test_put_is_skipped_after_a_clear():
+    cache = SearchResultCache()
+    query = np.ones(4, dtype=np.float32)
+    old_results = [{'recording_id': 'compacted', 'similarity': 1.0}]
+
+    generation = cache.generation
+    cache.clear()  # e.g. reload_search_index after the shards swapped
+
+    assert cached_search(cache, query, old_results, generation) is None
+
+
+def test_put_with_current_generation_is_stored_and_patched():
+    cache = SearchResultCache()
+    query = np.ones(4, dtype=np.float32)
+    results = [{'recording_id': 'a', 'similarity': 0.9}]
+
+    assert cached_search(cache, query, results, cache.generation) == results
+
+    cache.on_insert({'recording_id': 'b'}, query)
+    assert [m['recording_id'] for m in cache.get(cache.key(query, 0.5, 10))] == ['b', 'a']
+
+
+class ListenerDatabase:
+    """RecordingDatabase's listener API, with a search run between listeners."""
+
+    def __init__(self):
+        self.listeners = []
+
+    def add_insert_listener(self, listener, first=False):
+        self.listeners.insert(0 if first else len(self.listeners), listener)
+
+    def remove_insert_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def get_embedding_rows(self, embedding_version=None):
+        return []
+
+    def insert(self, record, embedding, between):
+        for listener in self.listeners:
+            listener(record, embedding)
+            between()
+
+
+def test_insert_with_shards_never_leaves_a_stale_cached_top_k(monkeypatch):
+    import main
+
+    db = ListenerDatabase()
+    monkeypatch.setattr(main, '_database', None)
+    monkeypatch.setattr(main, '_sharded_search', None)
+    monkeypatch.setattr(main, '_search_cache', SearchResultCache())
+    monkeypatch.setattr(main, 'SEARCH_SHARDS', 2)
+    monkeypatch.setattr(main, 'EMBEDDING_VERSION_STRICT', False)
+    monkeypatch.setattr(main, 'RecordingDatabase', lambda: db)
+    main.get_database()
+    sharded = main.get_sharded_search()
+    try:
+        query = np.ones(192, dtype=np.float32)
+
+        # A search (a cache miss) landing between any two listeners must not
+        # cache a result without the row
+        record = {'recording_id': 'new', 'user_id': None}
+        db.insert(record, query, between=lambda: main.nearest_recordings(query, 0.5, 10))
+
+        assert [m['recording_id'] for m in main.nearest_recordings(query, 0.5, 10)] == ['new']
+    finally:
+        sharded.close()
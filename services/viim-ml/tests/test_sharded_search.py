@@ -0,0 +1,103 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from utils.sharded_search import ShardedSearch
+
+
+def row(recording_id, embedding):
+    return {'recording_id': recording_id, 'user_id': None}, embedding
+
+
+@pytest.fixture
+def sharded():
+    search = ShardedSearch(2, dimensions=8)
+    yield search
+    search.close()
+
+
+def test_reload_swaps_atomically_and_keeps_concurrent_inserts(sharded):
+    query = np.ones(8, dtype=np.float32)
+    sharded.load(lambda: [row(f"old-{i}", query) for i in range(6)])
+    seen_during_reload = []
+
+    def fetch_rows():
+        # Mid-reload: searches still see the full old contents, and a live
+        # insert (also returned by this fetch) must survive the swap once
+        seen_during_reload.extend(m['recording_id'] for m in sharded.search(query, 0.5, 10))
+        sharded.add(*row("live", query))
+        return [row("new-0", query), row("new-1", query), row("live", query)]
+
+    assert sharded.load(fetch_rows) == 3
+
+    assert sorted(seen_during_reload) == [f"old-{i}" for i in range(6)]
+    after = sorted(m['recording_id'] for m in sharded.search(query, 0.5, 10))
+    assert after == ["live", "new-0", "new-1"]
+
+
+def test_failed_reload_keeps_current_contents(sharded):
+    query = np.ones(8, dtype=np.float32)
+    sharded.load(lambda: [row("kept", query)])
+
+    def failing_rows():
+        yield row("partial", query)
+        raise RuntimeError("database unavailable")
+
+    with pytest.raises(RuntimeError):
+        sharded.load(failing_rows)
+
+    assert [m['recording_id'] for m in sharded.search(query, 0.5, 10)] == ["kept"]
+
+
+def test_benchmark_loads_shards_through_the_public_signature(monkeypatch, capsys):
+    import benchmark_sharded_search
+
+    monkeypatch.setattr(sys, 'argv', [
+        'benchmark_sharded_search.py', '--recordings', '50', '--dimensions', '8',
+        '--shards', '2', '--queries', '3'
+    ])
+    benchmark_sharded_search.main()
+
+    assert "50 recordings" in capsys.readouterr().out
+
+
+def test_concurrent_searches_and_adds_all_get_their_own_replies(sharded):
+    query = np.ones(8, dtype=np.float32)
+    sharded.load(lambda: [row(f"base-{i}", query) for i in range(4)])
+    errors, results = [], []
+
+    def search_many():
+        try:
+            for _ in range(50):
+                results.append(len(sharded.search(query, 0.5, 100)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(20):
+        sharded.add(*row(f"live-{i}", query))
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(results) == 200 and all(4 <= count <= 24 for count in results)
+    assert len(sharded.search(query, 0.5, 100)) == 24
+
+
+def test_shard_errors_reach_the_caller(sharded):
+    sharded.load(lambda: [row("a", np.ones(8, dtype=np.float32)), row("b", np.ones(8, dtype=np.float32))])
+
+    with pytest.raises(ValueError, match="dimension mismatch"):
+        sharded.add(*row("c", np.ones(4, dtype=np.float32)))
+    assert len(sharded.search(np.ones(8, dtype=np.float32), 0.5, 10)) == 2
+
+
+def test_zero_limit_returns_nothing(sharded):
+    query = np.ones(8, dtype=np.float32)
+    sharded.load(lambda: [row("a", query)])
+
+    assert sharded.search(query, 0.5, 0) == []
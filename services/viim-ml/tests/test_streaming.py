@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils.streaming import StreamingSession, StreamLimitExceeded
+
+
+def pcm(seconds, sr=16000):
+    return (0.1 * np.ones(int(seconds * sr), dtype=np.float32)).tobytes()
+
+
+def test_byte_cap_closes_with_1009():
+    session = StreamingSession(16000, max_bytes=len(pcm(1.0)))
+    session.feed(pcm(1.0))
+
+    with pytest.raises(StreamLimitExceeded) as error:
+        session.feed(pcm(0.1))
+    assert error.value.close_code == 1009
+
+
+def test_session_time_cap_closes_with_1008():
+    session = StreamingSession(16000, max_session_seconds=0.05)
+    session.feed(pcm(0.1))
+    time.sleep(0.06)
+
+    with pytest.raises(StreamLimitExceeded) as error:
+        session.feed(pcm(0.1))
+    assert error.value.close_code == 1008
+    assert session.remaining_seconds() < 0
+
+
+def test_audio_past_max_duration_is_not_buffered():
+    session = StreamingSession(16000, max_duration=1.0)
+    for _ in range(5):
+        session.feed(pcm(0.5))
+
+    assert session.truncated
+    assert len(session.audio()) == 16000
+
+
+def test_container_bytes_stop_accumulating_once_truncated():
+    session = StreamingSession(0, encoding='webm')
+    session.feed(b'\x1a\x45\xdf\xa3')
+    session.truncated = True  # Set by the first decode that reaches max_duration
+    session.feed(b'\x00' * 1024)
+
+    assert len(session._container) == 4
+    assert session.bytes_received == 1028
+
+
+@pytest.mark.parametrize('bounds', [
+    {'threshold': -0.5}, {'threshold': 1.5}, {'threshold': float('nan')},
+    {'limit': 0}, {'limit': -3}, {'limit': 1000},
+])
+def test_out_of_range_start_message_gets_an_error_frame(bounds):
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app).websocket_connect('/ws/stream-embedding') as websocket:
+        websocket.send_json({'type': 'start', 'sample_rate': 16000, **bounds})
+        reply = websocket.receive_json()
+
+    assert reply['type'] == 'error'
+    assert next(iter(bounds)) in reply['detail']
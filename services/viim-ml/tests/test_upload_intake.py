@@ -0,0 +1,98 @@
+import json
+import subprocess
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from utils import upload_intake
+from utils.upload_intake import UploadSizeLimitMiddleware
+
+BOUNDARY = "intake-boundary"
+MAX_BYTES = 4096
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_BYTES, paths=("/upload",))
+
+    @app.post("/upload")
+    async def upload(audio: UploadFile = File(...)):
+        return {"size": len(await audio.read())}
+
+    return TestClient(app)
+
+
+def multipart_body(payload: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="audio"; filename="clip.wav"\r\n'
+        "Content-Type: audio/wav\r\n\r\n"
+    ).encode() + payload + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def chunked(body: bytes, size: int = 1024):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def post(client, content):
+    return client.post(
+        "/upload",
+        content=content,
+        headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+
+
+def test_small_upload_passes():
+    response = post(make_client(), multipart_body(b"x" * 1000))
+
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000}
+
+
+def test_oversized_content_length_is_rejected():
+    response = post(make_client(), multipart_body(b"x" * 2 * MAX_BYTES))
+
+    assert response.status_code == 413
+
+
+def test_oversized_chunked_body_is_rejected_with_413():
+    response = post(make_client(), chunked(multipart_body(b"x" * 2 * MAX_BYTES)))
+
+    assert response.status_code == 413
+    assert "Upload too large" in response.json()["detail"]
+
+
+def test_small_chunked_body_passes():
+    response = post(make_client(), chunked(multipart_body(b"x" * 1000)))
+
+    assert response.status_code == 200
+
+
+# An M4A whose moov atom follows the media data: ffprobe cannot seek on a pipe
+M4A_MOOV_AT_END = b"\x00\x00\x00\x20ftypM4A \x00\x00\x02\x00M4A mp42isom" + b"\x00" * 64
+
+
+def fake_ffprobe(monkeypatch, returncode, stdout=b"", stderr=b""):
+    def run(args, **kwargs):
+        assert args[0] == "ffprobe"
+        return subprocess.CompletedProcess(args, returncode, stdout=stdout, stderr=stderr)
+
+    monkeypatch.setattr(upload_intake.subprocess, "run", run)
+
+
+def test_inconclusive_probe_leaves_the_decision_to_the_decoder(monkeypatch):
+    fake_ffprobe(monkeypatch, 1, stderr=b"[mov,mp4,m4a] moov atom not found\npipe:0: Invalid data")
+
+    assert upload_intake.probe_audio(M4A_MOOV_AT_END) is None
+    assert upload_intake.inspect_upload(M4A_MOOV_AT_END) is None
+
+
+def test_probed_container_without_audio_is_rejected(monkeypatch):
+    fake_ffprobe(monkeypatch, 0, stdout=json.dumps({
+        "streams": [{"codec_type": "video"}], "format": {"duration": "3.0"}
+    }).encode())
+
+    with pytest.raises(ValueError, match="no audio stream"):
+        upload_intake.probe_audio(M4A_MOOV_AT_END)
@@ -0,0 +1,253 @@
+"""
+Admission control for inference requests.
+Bounds the number of requests running and waiting, enforces per-request
+deadlines and sheds work that cannot finish in time before it uses CPU.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+MODE_PRIORITIES = {
+    'identify': 0,
+    'enroll': 1,
+    'test': 2,
+    'backfill': 3,  # Background re-embedding yields to all live traffic
+}
+DEFAULT_PRIORITY = 1
+
+
+def priority_for_mode(mode: Optional[str]) -> int:
+    """Map a recording mode to a queue priority (identify before test)."""
+    return MODE_PRIORITIES.get(mode or '', DEFAULT_PRIORITY)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being run."""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(f"Request shed: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('priority', 'deadline', 'enqueued_at', 'future', 'cancelled')
+
+    def __init__(self, priority: int, deadline: float, future: asyncio.Future):
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.future = future
+        self.cancelled = False
+
+
+class AdmissionController:
+    """
+    Bounded priority queue in front of CPU-heavy work.
+
+    A request is admitted immediately if a slot is free. Otherwise it waits
+    in a priority queue bounded to ``max_queue`` entries. Before a request is
+    queued, and again before it is started, its deadline is checked against
+    the expected wait plus a moving average of the service time; requests
+    that cannot finish in time are rejected without running.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        max_queue: int = 16,
+        default_deadline: float = 30.0,
+        initial_service_time: float = 0.5
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+
+        self._active = 0
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._service_time = initial_service_time  # EWMA in seconds
+
+        self._admitted = 0
+        self._completed = 0
+        self._shed: Dict[str, int] = {}
+        self._shed_by_priority: Dict[int, int] = {}
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits: deque = deque(maxlen=1000)
+
+    def deadline_from_budget(self, budget_ms: Optional[float]) -> float:
+        """Convert a relative budget in milliseconds to an absolute deadline."""
+        budget = self.default_deadline if budget_ms is None else budget_ms / 1000.0
+        return time.monotonic() + budget
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        priority: int = DEFAULT_PRIORITY,
+        deadline: Optional[float] = None
+    ) -> Any:
+        """
+        Run ``func(*args)`` in the threadpool once admitted.
+
+        Args:
+            func: Blocking function to run
+            priority: Queue priority (lower runs first)
+            deadline: Absolute time.monotonic() deadline (default: now + default_deadline)
+
+        Raises:
+            AdmissionRejected: If the request was shed
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.default_deadline
+
+        await self._acquire(priority, deadline)
+        start = time.monotonic()
+        try:
+            return await run_in_threadpool(func, *args)
+        finally:
+            elapsed = time.monotonic() - start
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._completed += 1
+            self._release()
+
+    async def _acquire(self, priority: int, deadline: float) -> None:
+        now = time.monotonic()
+
+        if self._active < self.max_concurrency and not self._queue:
+            if now + self._service_time > deadline:
+                self._reject('deadline', priority)
+            self._admit(now, now)
+            return
+
+        # Estimate when a slot would free up for this request
+        ahead = sum(1 for _, _, w in self._queue if w.priority <= priority and not w.cancelled)
+        rounds = math.floor(ahead / self.max_concurrency) + 1
+        if now + (rounds + 1) * self._service_time > deadline:
+            self._reject('deadline', priority)
+
+        if len(self._queue) >= self.max_queue:
+            self._evict_lower_priority(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, deadline, future)
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(future, timeout=max(deadline - now, 0))
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self._reject('expired', priority)
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Slot was handed over just as the client went away
+                self._release()
+            raise
+
+    def _evict_lower_priority(self, priority: int) -> None:
+        """Make room in a full queue by shedding the lowest-priority waiter."""
+        live = [entry for entry in self._queue if not entry[2].cancelled]
+        if not live:
+            self._queue.clear()
+            return
+        worst = max(live, key=lambda entry: (entry[0], entry[1]))
+        if worst[0] <= priority:
+            self._reject('queue_full', priority)
+
+        waiter = worst[2]
+        waiter.cancelled = True
+        self._queue.remove(worst)
+        heapq.heapify(self._queue)
+        self._count_shed('preempted', waiter.priority)
+        waiter.future.set_exception(AdmissionRejected('preempted', self._retry_after()))
+
+    def _discard(self, waiter: _Waiter) -> None:
+        """Remove a waiter that gave up so it no longer counts toward max_queue."""
+        waiter.cancelled = True
+        remaining = [entry for entry in self._queue if entry[2] is not waiter]
+        if len(remaining) != len(self._queue):
+            self._queue = remaining
+            heapq.heapify(self._queue)
+
+    def _release(self) -> None:
+        """Free a slot and hand it to the next waiter."""
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the best waiters that can still finish in time."""
+        now = time.monotonic()
+
+        while self._queue and self._active < self.max_concurrency:
+            _, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled or waiter.future.done():
+                continue
+            if now + self._service_time > waiter.deadline:
+                waiter.cancelled = True
+                self._count_shed('expired', waiter.priority)
+                waiter.future.set_exception(AdmissionRejected('expired', self._retry_after()))
+                continue
+            self._admit(waiter.enqueued_at, now)
+            waiter.future.set_result(None)
+
+    def _admit(self, enqueued_at: float, now: float) -> None:
+        self._active += 1
+        self._admitted += 1
+        wait = now - enqueued_at
+        self._wait_count += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._recent_waits.append(wait)
+
+    def _retry_after(self) -> float:
+        queued = len(self._queue) + self._active
+        return max(1.0, queued * self._service_time / self.max_concurrency)
+
+    def _count_shed(self, reason: str, priority: int) -> None:
+        self._shed[reason] = self._shed.get(reason, 0) + 1
+        self._shed_by_priority[priority] = self._shed_by_priority.get(priority, 0) + 1
+        logger.warning(f"Shedding request (reason: {reason}, priority: {priority})")
+
+    def _reject(self, reason: str, priority: int) -> None:
+        self._count_shed(reason, priority)
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue, shed and wait-time counters for export."""
+        waits = sorted(self._recent_waits)
+        p95 = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        priority_names = {v: k for k, v in MODE_PRIORITIES.items()}
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'active': self._active,
+            'queued': sum(1 for _, _, w in self._queue if not w.cancelled),
+            'admitted': self._admitted,
+            'completed': self._completed,
+            'shed_total': sum(self._shed.values()),
+            'shed_by_reason': dict(self._shed),
+            'shed_by_priority': {
+                priority_names.get(p, str(p)): n for p, n in self._shed_by_priority.items()
+            },
+            'queue_wait_ms': {
+                'count': self._wait_count,
+                'mean': 1000 * self._wait_total / self._wait_count if self._wait_count else 0.0,
+                'p95': 1000 * p95,
+                'max': 1000 * self._wait_max,
+            },
+            'service_time_ms': 1000 * self._service_time,
+        }
@@ -4,19 +4,58 @@ Handles audio format conversion, resampling, normalization, and silence trimming
 """
 
 import numpy as np
-import librosa
-import soundfile as sf
 from io import BytesIO
-from typing import Tuple
+from typing import Tuple, Dict, Any, List, Optional
 
 
-def preprocess_audio(audio_bytes: bytes, target_sr: int = 16000) -> Tuple[np.ndarray, int]:
+def decode_audio(audio_bytes: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decode audio file bytes to a mono float32 waveform at its native rate.
+    
+    Raises:
+        ValueError: If the audio cannot be decoded
+    """
+    import librosa  # Deferred: heavy import, only needed once decoding runs
+    
+    try:
+        return librosa.load(BytesIO(audio_bytes), sr=None, mono=True)
+    except Exception as e:
+        raise ValueError(f"Failed to load audio: {str(e)}")
+
+
+def encode_wav(audio: np.ndarray, sr: int) -> bytes:
+    """
+    Encode a mono waveform as 16-bit PCM WAV.
+    
+    Args:
+        audio: Waveform (float, -1 to 1)
+        sr: Sample rate
+    
+    Returns:
+        WAV file contents
+    """
+    import soundfile as sf
+    
+    buffer = BytesIO()
+    sf.write(buffer, audio, sr, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def preprocess_audio(
+    audio_bytes: bytes,
+    target_sr: int = 16000,
+    max_duration: Optional[float] = None,
+    res_type: str = "soxr_hq"
+) -> Tuple[np.ndarray, int]:
     """
     Preprocess audio for ML model input.
     
     Args:
         audio_bytes: Raw audio file bytes (WAV, MP3, WebM, etc.)
         target_sr: Target sample rate (default: 16000 for ECAPA-TDNN)
+        max_duration: If set, keep only a center crop of this many seconds
+            after trimming
+        res_type: librosa resampler to use (default: 'soxr_hq')
     
     Returns:
         Tuple of (audio_array, sample_rate)
@@ -24,11 +63,43 @@ def preprocess_audio(audio_bytes: bytes, target_sr: int = 16000) -> Tuple[np.nda
     Raises:
         ValueError: If audio is invalid or too short/long
     """
-    # Load audio from bytes
-    try:
-        audio, sr = librosa.load(BytesIO(audio_bytes), sr=None, mono=True)
-    except Exception as e:
-        raise ValueError(f"Failed to load audio: {str(e)}")
+    audio, sr = decode_audio(audio_bytes)
+    
+    return preprocess_waveform(
+        audio, sr, target_sr=target_sr, max_duration=max_duration, res_type=res_type
+    )
+
+
+def resample_audio(audio: np.ndarray, sr: int, target_sr: int, res_type: str = "soxr_hq") -> np.ndarray:
+    """Resample a waveform (returned unchanged if already at ``target_sr``)."""
+    if sr == target_sr:
+        return audio
+    
+    import librosa
+    
+    return librosa.resample(audio, orig_sr=sr, target_sr=target_sr, res_type=res_type)
+
+
+def preprocess_waveform(
+    audio: np.ndarray,
+    sr: int,
+    target_sr: int = 16000,
+    max_duration: Optional[float] = None,
+    res_type: str = "soxr_hq"
+) -> Tuple[np.ndarray, int]:
+    """
+    Preprocess an already decoded mono waveform for ML model input.
+    
+    Same pipeline as preprocess_audio, minus decoding. Used for audio that
+    arrives as raw PCM (e.g. the streaming endpoint).
+    
+    Returns:
+        Tuple of (audio_array, sample_rate)
+    
+    Raises:
+        ValueError: If audio is too short/long
+    """
+    import librosa
     
     # Validate duration (1-10 seconds)
     duration = len(audio) / sr
@@ -38,9 +109,8 @@ def preprocess_audio(audio_bytes: bytes, target_sr: int = 16000) -> Tuple[np.nda
         raise ValueError(f"Audio too long: {duration:.2f}s (maximum 10s)")
     
     # Resample to target sample rate if needed
-    if sr != target_sr:
-        audio = librosa.resample(audio, orig_sr=sr, target_sr=target_sr)
-        sr = target_sr
+    audio = resample_audio(audio, sr, target_sr, res_type)
+    sr = target_sr
     
     # Normalize amplitude to [-1, 1] range
     max_val = np.abs(audio).max()
@@ -55,6 +125,13 @@ def preprocess_audio(audio_bytes: bytes, target_sr: int = 16000) -> Tuple[np.nda
     if final_duration < 0.5:
         raise ValueError(f"Audio too short after trimming: {final_duration:.2f}s")
     
+    # Center crop to bound inference cost
+    if max_duration is not None:
+        max_samples = int(max_duration * sr)
+        if len(audio) > max_samples:
+            offset = (len(audio) - max_samples) // 2
+            audio = audio[offset:offset + max_samples]
+    
     return audio, sr
 
 
@@ -77,3 +154,201 @@ def validate_audio_quality(audio: np.ndarray, sr: int) -> bool:
     
     return True
 
+
+def batch_quality_metrics(
+    clips: List[np.ndarray],
+    sr: int,
+    snr_margin_db: float = 6.0,
+    min_frame_energy: float = 1e-6,
+    speech_band: Tuple[float, float] = (300.0, 3400.0),
+    frame_ms: float = 30.0,
+    hop_ms: float = 10.0
+) -> Dict[str, np.ndarray]:
+    """
+    Compute quality metrics for several clips at once.
+    
+    Pass decoded audio before normalization and trimming: levels are
+    absolute, and the noise floor is estimated from the quiet frames that
+    trimming would remove. Clips are zero-padded into one matrix and every
+    metric is computed with array operations masked to each clip's length;
+    frame energies come from a cumulative sum, so no per-clip or per-frame
+    Python loop runs.
+    
+    Args:
+        clips: Waveforms at sample rate ``sr`` (different lengths allowed)
+        sr: Sample rate
+        snr_margin_db: Frames this far above the noise floor count as speech
+        min_frame_energy: Absolute floor (mean square) for a speech frame
+        speech_band: Frequency range (Hz) holding most speech energy
+        frame_ms: Frame length in milliseconds
+        hop_ms: Hop between frames in milliseconds
+    
+    Returns:
+        Dict of per-clip arrays: 'duration', 'energy' (mean square),
+        'dynamic_range' (max - min), 'snr_db' (loud frames vs noise floor),
+        'speech_band_ratio' (share of energy in ``speech_band``),
+        'speech_ratio' (fraction of frames that are speech) and 'speech_seconds'
+    """
+    frame_length = max(1, int(sr * frame_ms / 1000))
+    hop_length = max(1, int(sr * hop_ms / 1000))
+    
+    lengths = np.array([len(clip) for clip in clips])
+    max_length = max(int(lengths.max()), frame_length)
+    valid = np.arange(max_length) < lengths[:, None]
+    padded = np.zeros((len(clips), max_length), dtype=np.float32)
+    padded[valid] = np.concatenate(clips)
+    
+    squared = padded.astype(np.float64) ** 2
+    energy = squared.sum(axis=1) / np.maximum(lengths, 1)
+    dynamic_range = (
+        np.where(valid, padded, -np.inf).max(axis=1) - np.where(valid, padded, np.inf).min(axis=1)
+    )
+    
+    # Frame energies from a cumulative sum of squares: (N, frames)
+    cumulative = np.concatenate([np.zeros((len(clips), 1)), np.cumsum(squared, axis=1)], axis=1)
+    starts = np.arange(0, max_length - frame_length + 1, hop_length)
+    frame_energy = (cumulative[:, starts + frame_length] - cumulative[:, starts]) / frame_length
+    frame_valid = (starts + frame_length <= lengths[:, None]) | (starts == 0)
+    
+    # Noise floor and speech level from the quiet and loud ends of each clip's frames
+    masked = np.where(frame_valid, frame_energy, np.nan)
+    noise_floor = np.maximum(np.nanpercentile(masked, 10, axis=1), 1e-12)
+    loud_level = np.maximum(np.nanpercentile(masked, 90, axis=1), 1e-12)
+    snr_db = 10.0 * np.log10(loud_level / noise_floor)
+    
+    speech = (
+        frame_valid
+        & (frame_energy >= noise_floor[:, None] * 10.0 ** (snr_margin_db / 10.0))
+        & (frame_energy >= min_frame_energy)
+    )
+    
+    # Zero padding adds no energy, so band shares are unaffected by clip length
+    power = np.abs(np.fft.rfft(padded, axis=1)) ** 2
+    frequencies = np.fft.rfftfreq(max_length, d=1.0 / sr)
+    in_band = (frequencies >= speech_band[0]) & (frequencies <= speech_band[1])
+    total_power = power.sum(axis=1)
+    speech_band_ratio = np.where(
+        total_power > 0, power[:, in_band].sum(axis=1) / np.maximum(total_power, 1e-24), 0.0
+    )
+    
+    return {
+        'duration': lengths / sr,
+        'energy': energy,
+        'dynamic_range': dynamic_range,
+        'snr_db': snr_db,
+        'speech_band_ratio': speech_band_ratio,
+        'speech_ratio': speech.sum(axis=1) / frame_valid.sum(axis=1),
+        'speech_seconds': speech.sum(axis=1) * hop_length / sr,
+    }
+
+
+def frame_energy_db(
+    audio: np.ndarray,
+    sr: int,
+    frame_ms: float = 30.0,
+    hop_ms: float = 10.0
+) -> Tuple[np.ndarray, int, int]:
+    """
+    Compute per-frame energy in dB relative to the loudest frame.
+    
+    Frames are built as a strided view over the signal, so no per-frame
+    Python loop runs.
+    
+    Returns:
+        Tuple of (energy_db per frame, frame_length, hop_length) in samples
+    """
+    frame_length = max(1, int(sr * frame_ms / 1000))
+    hop_length = max(1, int(sr * hop_ms / 1000))
+    
+    if len(audio) < frame_length:
+        audio = np.pad(audio, (0, frame_length - len(audio)))
+    
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame_length)[::hop_length]
+    energy = np.mean(frames.astype(np.float32) ** 2, axis=1)
+    
+    peak = energy.max()
+    if peak <= 0:
+        return np.full(len(energy), -np.inf, dtype=np.float32), frame_length, hop_length
+    
+    energy_db = 10.0 * np.log10(np.maximum(energy, 1e-12) / peak)
+    return energy_db.astype(np.float32), frame_length, hop_length
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Run-length encode a boolean mask into (starts, ends, values)."""
+    change = np.flatnonzero(np.diff(mask.astype(np.int8))) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(mask)]))
+    return starts, ends, mask[starts]
+
+
+def _mask_from_ranges(starts: np.ndarray, ends: np.ndarray, length: int) -> np.ndarray:
+    """Build a boolean mask of ``length`` that is True inside [start, end) ranges."""
+    delta = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(delta, starts, 1)
+    np.add.at(delta, ends, -1)
+    return np.cumsum(delta[:-1]) > 0
+
+
+def apply_vad(
+    audio: np.ndarray,
+    sr: int,
+    threshold_db: float = 35.0,
+    frame_ms: float = 30.0,
+    hop_ms: float = 10.0,
+    min_speech_ms: float = 100.0,
+    min_silence_ms: float = 200.0,
+    min_output_s: float = 0.5
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Remove internal non-speech using a frame-energy voice activity detector.
+    
+    Args:
+        audio: Preprocessed audio array (1D, normalized)
+        sr: Sample rate
+        threshold_db: Frames more than this many dB below the loudest
+            frame are treated as non-speech
+        frame_ms: Analysis frame length in milliseconds
+        hop_ms: Hop between frames in milliseconds
+        min_speech_ms: Speech runs shorter than this are dropped
+        min_silence_ms: Silence runs shorter than this are kept as speech,
+            so short gaps between words are not cut out
+        min_output_s: If less speech than this remains, the input is
+            returned unchanged
+    
+    Returns:
+        Tuple of (voiced_audio, stats) where stats holds the number of
+        input/output samples and the fraction of samples removed
+    """
+    total = len(audio)
+    energy_db, frame_length, hop_length = frame_energy_db(audio, sr, frame_ms, hop_ms)
+    speech = energy_db > -threshold_db
+    
+    # Fill short silences first, then drop short speech bursts
+    min_silence_frames = int(np.ceil(min_silence_ms / hop_ms))
+    starts, ends, values = _runs(speech)
+    short_gaps = (~values) & ((ends - starts) < min_silence_frames)
+    short_gaps[[0, -1]] = False  # leading/trailing silence is never a gap
+    speech |= _mask_from_ranges(starts[short_gaps], ends[short_gaps], len(speech))
+    
+    min_speech_frames = int(np.ceil(min_speech_ms / hop_ms))
+    starts, ends, values = _runs(speech)
+    keep = values & ((ends - starts) >= min_speech_frames)
+    starts, ends = starts[keep], ends[keep]
+    
+    # Map frame runs back to sample ranges and build the sample mask
+    sample_starts = np.minimum(starts * hop_length, total)
+    sample_ends = np.minimum((ends - 1) * hop_length + frame_length, total)
+    sample_mask = _mask_from_ranges(sample_starts, sample_ends, total)
+    
+    voiced = audio[sample_mask]
+    if len(voiced) < min_output_s * sr:
+        voiced = audio
+    
+    stats = {
+        'input_samples': int(total),
+        'output_samples': int(len(voiced)),
+        'removed_fraction': float(1.0 - len(voiced) / total) if total else 0.0,
+        'segments': int(len(starts))
+    }
+    return voiced, stats
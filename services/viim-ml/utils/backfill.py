@@ -0,0 +1,222 @@
+"""
+Resumable background re-embedding of stored recordings.
+Runs when the model, backend or preprocessing changes: recordings that lack
+an embedding of the current version are re-embedded from their stored
+audio in batches, with a checkpoint file so an interrupted job resumes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from utils.admission import AdmissionRejected
+from utils.database import RecordingDatabase
+
+logger = logging.getLogger(__name__)
+
+
+def read_checkpoint(checkpoint_path: str, embedding_version: str) -> Optional[Dict[str, Any]]:
+    """Load a backfill checkpoint, or None if there is none for ``embedding_version``."""
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as f:
+        state = json.load(f)
+    if state.get('embedding_version') != embedding_version:
+        return None
+    state.setdefault('failed_ids', [])  # Checkpoints written before failed rows were kept
+    state.setdefault('completed_at', state.get('updated_at') if state.get('completed') else None)
+    return state
+
+
+class BackfillJob:
+    """
+    Re-embed recordings into a new embedding version.
+
+    Rows are processed in (created_at, recording_id) order. After each batch
+    the last row handled, the counters and the ids of rows that failed are
+    written to the checkpoint, so a restarted job continues where it
+    stopped. Once the cursor reaches the end, failed rows get another
+    attempt; rows that fail again stay listed for the next run. Each clip goes through
+    ``submit`` (the admission controller at backfill priority), which sheds
+    it first when live requests are waiting; ``max_rate`` caps throughput.
+    """
+
+    def __init__(
+        self,
+        db: RecordingDatabase,
+        embedding_version: str,
+        embed: Callable[[bytes, Dict[str, Any]], np.ndarray],
+        submit: Callable[..., Awaitable[Any]],
+        checkpoint_path: str,
+        batch_size: int = 16,
+        max_rate: float = 2.0
+    ):
+        """
+        Args:
+            db: Database to read recordings from and write embeddings to
+            embedding_version: Version the new embeddings are stored under
+            embed: Blocking function (audio bytes, recording row) -> embedding
+            submit: Async callable that runs ``embed(*args)`` (e.g. through
+                the admission controller); may raise AdmissionRejected
+            checkpoint_path: JSON file recording progress
+            batch_size: Rows fetched and checkpointed together
+            max_rate: Maximum recordings re-embedded per second (0 = unlimited)
+        """
+        self.db = db
+        self.embedding_version = embedding_version
+        self.embed = embed
+        self.submit = submit
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+
+        self._stop = asyncio.Event()
+        self.state = self._load_checkpoint()
+        self.running = False
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        """Resume from the checkpoint if it is for the same version."""
+        state = read_checkpoint(self.checkpoint_path, self.embedding_version)
+        if state is not None:
+            return state
+        return {
+            'embedding_version': self.embedding_version,
+            'cursor': None,  # [created_at ISO, recording_id] of the last row handled
+            'processed': 0,
+            'skipped': 0,
+            'failed': 0,
+            'failed_ids': [],  # Rows to retry once the cursor reaches the end
+            'shed': 0,
+            'last_error': None,
+            'completed': False,
+            'completed_at': None,  # When a run last reached the end (kept across later runs)
+            'updated_at': None,
+        }
+
+    def _save_checkpoint(self) -> None:
+        self.state['updated_at'] = datetime.now().isoformat()
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def stop(self) -> None:
+        """Ask the job to stop after the current clip (progress is kept)."""
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {**self.state, 'running': self.running}
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Process batches until every recording has been handled or stop() is called.
+
+        Returns:
+            Final status
+        """
+        self.running = True
+        self.state['completed'] = False
+        logger.info(f"Backfill to {self.embedding_version} starting from {self.state['cursor']}")
+        try:
+            while not self._stop.is_set():
+                cursor = self.state['cursor']
+                after = (datetime.fromisoformat(cursor[0]), cursor[1]) if cursor else None
+                rows = await run_in_threadpool(
+                    self.db.get_backfill_batch, self.embedding_version, after, self.batch_size
+                )
+                if not rows:
+                    await self._retry_failed()
+                    self.state['completed'] = not self._stop.is_set()
+                    if self.state['completed']:
+                        self.state['completed_at'] = datetime.now().isoformat()
+                    break
+
+                for row in rows:
+                    if self._stop.is_set():
+                        break
+                    started = time.monotonic()
+                    if not await self._process(row):
+                        break
+                    created_at = row['created_at']
+                    self.state['cursor'] = [
+                        created_at.isoformat() if hasattr(created_at, 'isoformat') else str(created_at),
+                        row['recording_id']
+                    ]
+                    if self.max_rate > 0:
+                        remaining = 1.0 / self.max_rate - (time.monotonic() - started)
+                        if remaining > 0:
+                            await asyncio.sleep(remaining)
+
+                await run_in_threadpool(self._save_checkpoint)
+        finally:
+            self.running = False
+            await run_in_threadpool(self._save_checkpoint)
+
+        logger.info(
+            f"Backfill to {self.embedding_version} "
+            f"{'completed' if self.state['completed'] else 'stopped'}: "
+            f"{self.state['processed']} re-embedded, {self.state['skipped']} without audio, "
+            f"{self.state['failed']} failed, {len(self.state['failed_ids'])} still failing"
+        )
+        return self.status()
+
+    async def _retry_failed(self) -> None:
+        """Give every row that failed earlier one more attempt."""
+        for recording_id in list(self.state['failed_ids']):
+            if self._stop.is_set():
+                return
+            row = await run_in_threadpool(self.db.get_recording, recording_id)
+            self.state['failed_ids'].remove(recording_id)
+            if row is None:
+                continue  # Deleted since it failed
+            if not await self._process(row):
+                self.state['failed_ids'].append(recording_id)
+                return
+            await run_in_threadpool(self._save_checkpoint)
+
+    async def _process(self, row: Dict[str, Any]) -> bool:
+        """
+        Re-embed one recording, retrying while live traffic sheds it.
+
+        Returns:
+            False if the job was stopped before the row was handled
+        """
+        file_path = row.get('file_path')
+        if not file_path or not os.path.exists(file_path):
+            self.state['skipped'] += 1
+            return True
+
+        try:
+            with open(file_path, 'rb') as f:
+                audio_bytes = f.read()
+
+            while True:
+                try:
+                    embedding = await self.submit(self.embed, audio_bytes, row)
+                    break
+                except AdmissionRejected as e:
+                    self.state['shed'] += 1
+                    await asyncio.sleep(e.retry_after)
+                    if self._stop.is_set():
+                        return False
+
+            await run_in_threadpool(
+                self.db.upsert_version_embedding,
+                row['recording_id'],
+                self.embedding_version,
+                embedding,
+                {'source': 'backfill'}
+            )
+            self.state['processed'] += 1
+        except Exception as e:
+            logger.warning(f"Backfill failed for {row['recording_id']}: {str(e)}")
+            self.state['failed'] += 1
+            self.state['last_error'] = f"{row['recording_id']}: {str(e)}"
+            if row['recording_id'] not in self.state['failed_ids']:
+                self.state['failed_ids'].append(row['recording_id'])
+        return True
@@ -2,10 +2,13 @@
 DuckDB database manager for storing recordings and embeddings.
 """
 
-import duckdb
+import glob
 import os
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Tuple, Callable, Iterator
+from datetime import datetime, timedelta
 import numpy as np
 import logging
 import json
@@ -15,15 +18,68 @@ logger = logging.getLogger(__name__)
 # Database file path
 DB_PATH = os.getenv("DUCKDB_PATH", "voiceprints.db")
 
+# Cold tier: Parquet files partitioned by month and mode
+COLD_PATH = os.getenv("RECORDINGS_COLD_PATH", "recordings_cold")
+HOT_RETENTION_DAYS = int(os.getenv("RECORDINGS_HOT_RETENTION_DAYS", "30"))
+
+# Version label for embeddings written by this deployment; change it whenever
+# the model, backend or preprocessing changes so old and new vectors are never compared
+LEGACY_EMBEDDING_VERSION = "ecapa-voxceleb-v1"  # Rows written before versioning
+EMBEDDING_VERSION = os.getenv("EMBEDDING_VERSION", LEGACY_EMBEDDING_VERSION)
+
+# Column order of the recordings table (matches SELECT *)
+RECORDING_COLUMNS = [
+    'recording_id', 'user_id', 'filename', 'file_path',
+    'duration_seconds', 'file_size_bytes', 'sample_rate', 'audio_format',
+    'created_at', 'updated_at', 'mode', 'status',
+    'embedding', 'embedding_dimensions',
+    'voiceprint_id', 'similarity_score', 'matched_user_id', 'metadata',
+    'quality_tier', 'embedding_version'
+]
+COLUMNS_SQL = ', '.join(RECORDING_COLUMNS)
+
+
+def _as_stored_time(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Convert a timezone-aware datetime to the naive local time created_at is stored in.
+    
+    Query parameters such as ``?since=2024-05-01T00:00:00Z`` parse as aware
+    datetimes, which cannot be compared with the naive stored timestamps.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
 
 class RecordingDatabase:
     """Manages DuckDB database for voice recordings and embeddings."""
     
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: str = DB_PATH, cold_path: str = COLD_PATH):
         """Initialize database connection and create tables if needed."""
+        import duckdb  # Deferred so importing this module stays cheap
+        
         self.db_path = db_path
+        self.cold_path = cold_path
         self.conn = duckdb.connect(db_path)
+        self._insert_listeners: List[Callable[[Dict[str, Any], np.ndarray], None]] = []
         self._create_tables()
+        self._recover_cold_staging()
+    
+    @contextmanager
+    def _cursor(self) -> Iterator[Any]:
+        """
+        Open a cursor for one call.
+        
+        Methods run on threadpool threads (search, backfill, compaction)
+        while requests insert on others, and a DuckDB connection must not be
+        used from two threads at once; each cursor is its own connection to
+        the same database.
+        """
+        cursor = self.conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
     
     def _create_tables(self):
         """Create recordings table if it doesn't exist."""
@@ -41,12 +97,52 @@ class RecordingDatabase:
                 updated_at TIMESTAMP,
                 mode VARCHAR,  -- 'test', 'enroll', 'identify'
                 status VARCHAR,  -- 'completed', 'failed', 'processing'
-                embedding ARRAY(FLOAT),  -- 192-dimensional vector
+                embedding FLOAT[],  -- 192-dimensional vector
                 embedding_dimensions INTEGER,
                 voiceprint_id VARCHAR,
                 similarity_score FLOAT,
                 matched_user_id VARCHAR,
-                metadata VARCHAR  -- Additional metadata as JSON string
+                metadata VARCHAR,  -- Additional metadata as JSON string
+                quality_tier VARCHAR,  -- 'fast', 'balanced', 'accurate'
+                embedding_version VARCHAR  -- Model/preprocessing version of embedding
+            )
+        """)
+        
+        # Columns added after the initial schema (no-op on new databases)
+        self.conn.execute("""
+            ALTER TABLE recordings ADD COLUMN IF NOT EXISTS quality_tier VARCHAR
+        """)
+        self.conn.execute("""
+            ALTER TABLE recordings ADD COLUMN IF NOT EXISTS embedding_version VARCHAR
+        """)
+        
+        # Embeddings of other versions, written by the re-embedding backfill
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS recording_embeddings (
+                recording_id VARCHAR,
+                embedding_version VARCHAR,
+                embedding FLOAT[],
+                embedding_dimensions INTEGER,
+                created_at TIMESTAMP,
+                metadata VARCHAR,
+                PRIMARY KEY (recording_id, embedding_version)
+            )
+        """)
+        
+        # One quality-weighted template per voiceprint (see utils/enrollment.py)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS voiceprint_templates (
+                voiceprint_id VARCHAR,
+                embedding_version VARCHAR,
+                user_id VARCHAR,
+                embedding FLOAT[],
+                embedding_dimensions INTEGER,
+                num_clips INTEGER,
+                total_weight FLOAT,
+                created_at TIMESTAMP,
+                updated_at TIMESTAMP,
+                metadata VARCHAR,  -- Clip recording IDs and weights as JSON
+                PRIMARY KEY (voiceprint_id, embedding_version)
             )
         """)
         
@@ -81,7 +177,9 @@ class RecordingDatabase:
         voiceprint_id: Optional[str] = None,
         similarity_score: Optional[float] = None,
         matched_user_id: Optional[str] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        quality_tier: Optional[str] = None,
+        embedding_version: str = EMBEDDING_VERSION
     ) -> bool:
         """
         Insert a new recording record with embedding.
@@ -101,6 +199,8 @@ class RecordingDatabase:
             similarity_score: Similarity score (if identified)
             matched_user_id: Matched user ID (if identified)
             metadata: Additional metadata as dictionary
+            quality_tier: Extraction tier used ('fast', 'balanced', 'accurate')
+            embedding_version: Model/preprocessing version of the embedding
         
         Returns:
             True if successful
@@ -116,48 +216,173 @@ class RecordingDatabase:
             if metadata:
                 metadata_json = json.dumps(metadata)
             
-            self.conn.execute("""
-                INSERT INTO recordings (
-                    recording_id, user_id, filename, file_path,
-                    duration_seconds, file_size_bytes, sample_rate, audio_format,
-                    created_at, updated_at, mode, status,
-                    embedding, embedding_dimensions,
-                    voiceprint_id, similarity_score, matched_user_id, metadata
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
-                recording_id,
-                user_id,
-                filename,
-                file_path,
-                duration_seconds,
-                file_size_bytes,
-                sample_rate,
-                audio_format,
-                now,
-                now,
-                mode,
-                'completed',
-                embedding_list,
-                len(embedding_list),
-                voiceprint_id,
-                similarity_score,
-                matched_user_id,
-                metadata_json
-            ])
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO recordings (
+                        recording_id, user_id, filename, file_path,
+                        duration_seconds, file_size_bytes, sample_rate, audio_format,
+                        created_at, updated_at, mode, status,
+                        embedding, embedding_dimensions,
+                        voiceprint_id, similarity_score, matched_user_id, metadata,
+                        quality_tier, embedding_version
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    recording_id,
+                    user_id,
+                    filename,
+                    file_path,
+                    duration_seconds,
+                    file_size_bytes,
+                    sample_rate,
+                    audio_format,
+                    now,
+                    now,
+                    mode,
+                    'completed',
+                    embedding_list,
+                    len(embedding_list),
+                    voiceprint_id,
+                    similarity_score,
+                    matched_user_id,
+                    metadata_json,
+                    quality_tier,
+                    embedding_version
+                ])
             
             logger.info(f"Recording {recording_id} inserted into database")
+            
+            record = self._search_record((
+                recording_id, user_id, None, now, mode,
+                filename, duration_seconds, voiceprint_id, quality_tier
+            ))
+            for listener in self._insert_listeners:
+                try:
+                    listener(record, np.asarray(embedding_list, dtype=np.float32))
+                except Exception as listener_error:
+                    logger.warning(f"Insert listener failed: {str(listener_error)}")
             return True
             
         except Exception as e:
             logger.error(f"Failed to insert recording: {str(e)}")
             return False
     
+    def add_insert_listener(
+        self,
+        listener: Callable[[Dict[str, Any], np.ndarray], None],
+        first: bool = False
+    ) -> None:
+        """
+        Register a callback run after each successful insert_recording.
+        
+        The callback receives the row in search-result format (without
+        'similarity') and the embedding. Used to keep search shards and
+        caches in sync with the table. Listeners run in order; ``first``
+        puts an index ahead of caches built from it, so a cache never
+        learns of a row before the index can return it.
+        """
+        if first:
+            self._insert_listeners.insert(0, listener)
+        else:
+            self._insert_listeners.append(listener)
+    
+    def remove_insert_listener(
+        self,
+        listener: Callable[[Dict[str, Any], np.ndarray], None]
+    ) -> None:
+        """Unregister a callback added with add_insert_listener (no-op if absent)."""
+        if listener in self._insert_listeners:
+            self._insert_listeners.remove(listener)
+    
+    def upsert_template(
+        self,
+        voiceprint_id: str,
+        user_id: Optional[str],
+        embedding: np.ndarray,
+        num_clips: int,
+        total_weight: float,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding_version: str = EMBEDDING_VERSION
+    ) -> None:
+        """
+        Store (or replace) the enrollment template for a voiceprint.
+        
+        Args:
+            voiceprint_id: Voiceprint the template represents
+            user_id: User who enrolled (optional)
+            embedding: Normalized template embedding
+            num_clips: Number of clips that contributed
+            total_weight: Sum of the contributing clips' quality weights
+            metadata: Additional metadata as dictionary
+            embedding_version: Model/preprocessing version of the embedding
+        """
+        now = datetime.now()
+        embedding_list = embedding.tolist() if isinstance(embedding, np.ndarray) else embedding
+        with self._cursor() as cursor:
+            existing = cursor.execute("""
+                SELECT created_at FROM voiceprint_templates
+                WHERE voiceprint_id = ? AND embedding_version = ?
+            """, [voiceprint_id, embedding_version]).fetchone()
+            
+            cursor.execute("""
+                INSERT OR REPLACE INTO voiceprint_templates (
+                    voiceprint_id, embedding_version, user_id, embedding, embedding_dimensions,
+                    num_clips, total_weight, created_at, updated_at, metadata
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                voiceprint_id,
+                embedding_version,
+                user_id,
+                embedding_list,
+                len(embedding_list),
+                num_clips,
+                total_weight,
+                existing[0] if existing else now,
+                now,
+                json.dumps(metadata) if metadata else None
+            ])
+        logger.info(f"Template for voiceprint {voiceprint_id} stored ({num_clips} clips)")
+    
+    def get_template(
+        self,
+        voiceprint_id: str,
+        embedding_version: str = EMBEDDING_VERSION
+    ) -> Optional[Dict[str, Any]]:
+        """Get a voiceprint's template (embedding as a float32 array), or None."""
+        with self._cursor() as cursor:
+            result = cursor.execute("""
+                SELECT voiceprint_id, embedding_version, user_id, embedding, num_clips,
+                       total_weight, updated_at
+                FROM voiceprint_templates
+                WHERE voiceprint_id = ? AND embedding_version = ?
+            """, [voiceprint_id, embedding_version]).fetchone()
+        if result is None:
+            return None
+        
+        return {
+            'voiceprint_id': result[0],
+            'embedding_version': result[1],
+            'user_id': result[2],
+            'embedding': np.asarray(result[3], dtype=np.float32),
+            'num_clips': result[4],
+            'total_weight': result[5],
+            'updated_at': result[6].isoformat() if hasattr(result[6], 'isoformat') else result[6]
+        }
+    
     def get_recording(self, recording_id: str) -> Optional[Dict[str, Any]]:
         """Get a recording by ID."""
         try:
-            result = self.conn.execute("""
-                SELECT * FROM recordings WHERE recording_id = ?
-            """, [recording_id]).fetchone()
+            with self._cursor() as cursor:
+                result = cursor.execute(f"""
+                    SELECT {COLUMNS_SQL} FROM recordings WHERE recording_id = ?
+                """, [recording_id]).fetchone()
+            
+            # Fall back to the cold tier for compacted rows
+            if result is None and self._cold_files():
+                source, params = self._recordings_source(datetime.min)
+                with self._cursor() as cursor:
+                    result = cursor.execute(f"""
+                        SELECT {COLUMNS_SQL} FROM {source} WHERE recording_id = ?
+                    """, params + [recording_id]).fetchone()
             
             if result:
                 return self._row_to_dict(result)
@@ -169,16 +394,20 @@ class RecordingDatabase:
     def get_user_recordings(
         self,
         user_id: str,
-        limit: int = 100
+        limit: int = 100,
+        since: Optional[datetime] = None
     ) -> List[Dict[str, Any]]:
-        """Get all recordings for a user."""
+        """Get all recordings for a user (cold tier included only if ``since`` reaches it)."""
         try:
-            results = self.conn.execute("""
-                SELECT * FROM recordings 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            """, [user_id, limit]).fetchall()
+            since = _as_stored_time(since)
+            source, params = self._recordings_source(since)
+            with self._cursor() as cursor:
+                results = cursor.execute(f"""
+                    SELECT {COLUMNS_SQL} FROM {source} 
+                    WHERE user_id = ? AND created_at >= ?
+                    ORDER BY created_at DESC 
+                    LIMIT ?
+                """, params + [user_id, since or datetime.min, limit]).fetchall()
             
             return [self._row_to_dict(row) for row in results]
         except Exception as e:
@@ -187,15 +416,19 @@ class RecordingDatabase:
     
     def get_recordings_by_voiceprint(
         self,
-        voiceprint_id: str
+        voiceprint_id: str,
+        since: Optional[datetime] = None
     ) -> List[Dict[str, Any]]:
         """Get all recordings associated with a voiceprint."""
         try:
-            results = self.conn.execute("""
-                SELECT * FROM recordings 
-                WHERE voiceprint_id = ? 
-                ORDER BY created_at DESC
-            """, [voiceprint_id]).fetchall()
+            since = _as_stored_time(since)
+            source, params = self._recordings_source(since)
+            with self._cursor() as cursor:
+                results = cursor.execute(f"""
+                    SELECT {COLUMNS_SQL} FROM {source} 
+                    WHERE voiceprint_id = ? AND created_at >= ?
+                    ORDER BY created_at DESC
+                """, params + [voiceprint_id, since or datetime.min]).fetchall()
             
             return [self._row_to_dict(row) for row in results]
         except Exception as e:
@@ -206,78 +439,403 @@ class RecordingDatabase:
         self,
         query_embedding: np.ndarray,
         threshold: float = 0.7,
-        limit: int = 10
+        limit: int = 10,
+        since: Optional[datetime] = None,
+        embedding_version: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Search recordings by embedding similarity using cosine similarity.
         
+        Only the hot table is scanned unless ``since`` reaches back into
+        compacted months. With ``embedding_version``, only recordings that
+        have an embedding of that version are compared.
+        
         Note: DuckDB doesn't have built-in cosine similarity, so we'll
         need to compute it in Python after fetching embeddings.
+        
+        Raises:
+            duckdb.Error: If the query fails (never reported as "no matches",
+                which callers would cache)
         """
-        try:
-            # Get all recordings with embeddings
-            results = self.conn.execute("""
-                SELECT recording_id, user_id, embedding, created_at, mode, 
-                       filename, duration_seconds, voiceprint_id
-                FROM recordings 
-                WHERE embedding IS NOT NULL
-                ORDER BY created_at DESC
-            """).fetchall()
-            
-            # Compute cosine similarity for each
-            matches = []
-            query_emb = query_embedding / np.linalg.norm(query_embedding) if np.linalg.norm(query_embedding) > 0 else query_embedding
-            
-            for row in results:
-                stored_embedding = np.array(row[2])  # embedding column
-                stored_emb_norm = stored_embedding / np.linalg.norm(stored_embedding) if np.linalg.norm(stored_embedding) > 0 else stored_embedding
-                
-                similarity = np.dot(query_emb, stored_emb_norm)
-                
-                if similarity >= threshold:
-                    matches.append({
-                        'recording_id': row[0],
-                        'user_id': row[1],
-                        'similarity': float(similarity),
-                        'created_at': row[3].isoformat() if hasattr(row[3], 'isoformat') else str(row[3]),
-                        'mode': row[4],
-                        'filename': row[5],
-                        'duration_seconds': row[6],
-                        'voiceprint_id': row[7]
-                    })
+        # Get all recordings with embeddings
+        query, params = self._embedding_query(since, embedding_version)
+        with self._cursor() as cursor:
+            results = cursor.execute(query, params).fetchall()
+        
+        # Compute cosine similarity for each
+        matches = []
+        query_emb = query_embedding / np.linalg.norm(query_embedding) if np.linalg.norm(query_embedding) > 0 else query_embedding
+        
+        for row in results:
+            stored_embedding = np.array(row[2])  # embedding column
+            stored_emb_norm = stored_embedding / np.linalg.norm(stored_embedding) if np.linalg.norm(stored_embedding) > 0 else stored_embedding
             
-            # Sort by similarity and limit
-            matches.sort(key=lambda x: x['similarity'], reverse=True)
-            return matches[:limit]
+            similarity = np.dot(query_emb, stored_emb_norm)
             
-        except Exception as e:
-            logger.error(f"Failed to search by embedding: {str(e)}")
-            return []
+            if similarity >= threshold:
+                matches.append({
+                    'recording_id': row[0],
+                    'user_id': row[1],
+                    'similarity': float(similarity),
+                    'created_at': row[3].isoformat() if hasattr(row[3], 'isoformat') else str(row[3]),
+                    'mode': row[4],
+                    'filename': row[5],
+                    'duration_seconds': row[6],
+                    'voiceprint_id': row[7],
+                    'quality_tier': row[8]
+                })
+        
+        # Sort by similarity and limit
+        matches.sort(key=lambda x: x['similarity'], reverse=True)
+        return matches[:limit]
+    
+    def get_embedding_rows(
+        self,
+        since: Optional[datetime] = None,
+        embedding_version: Optional[str] = None
+    ) -> List[Tuple[Dict[str, Any], List[float]]]:
+        """
+        Get every recording with an embedding as (record, embedding) pairs.
+        
+        Records use the search-result format (without 'similarity'), for
+        loading external search indexes such as the sharded search.
+        """
+        query, params = self._embedding_query(since, embedding_version)
+        with self._cursor() as cursor:
+            results = cursor.execute(query, params).fetchall()
+        return [(self._search_record(row), row[2]) for row in results]
+    
+    def _embedding_query(
+        self,
+        since: Optional[datetime],
+        embedding_version: Optional[str]
+    ) -> Tuple[str, List[Any]]:
+        """
+        Build the query returning search rows with their embeddings.
+        
+        Without a version, each row's own embedding is returned. With one,
+        the backfilled embedding of that version is preferred, the row's own
+        embedding is used if it already has that version, and rows with
+        neither are left out.
+        
+        Returns:
+            Tuple of (SQL, parameters)
+        """
+        since = _as_stored_time(since)
+        source, params = self._recordings_source(since)
+        if embedding_version is None:
+            return f"""
+                SELECT recording_id, user_id, embedding, created_at, mode, 
+                       filename, duration_seconds, voiceprint_id, quality_tier
+                FROM {source} 
+                WHERE embedding IS NOT NULL AND created_at >= ?
+                ORDER BY created_at DESC
+            """, params + [since or datetime.min]
+        
+        return f"""
+            SELECT r.recording_id, r.user_id, COALESCE(v.embedding, r.embedding) AS embedding,
+                   r.created_at, r.mode, r.filename, r.duration_seconds, r.voiceprint_id,
+                   r.quality_tier
+            FROM {source} r
+            LEFT JOIN recording_embeddings v
+                ON v.recording_id = r.recording_id AND v.embedding_version = ?
+            WHERE (
+                v.embedding IS NOT NULL
+                OR (r.embedding IS NOT NULL AND COALESCE(r.embedding_version, ?) = ?)
+            ) AND r.created_at >= ?
+            ORDER BY r.created_at DESC
+        """, params + [
+            embedding_version, LEGACY_EMBEDDING_VERSION, embedding_version,
+            since or datetime.min
+        ]
     
-    def get_recent_recordings(self, limit: int = 50) -> List[Dict[str, Any]]:
+    def get_backfill_batch(
+        self,
+        embedding_version: str,
+        after: Optional[Tuple[datetime, str]] = None,
+        limit: int = 16
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the next recordings that lack an embedding of ``embedding_version``.
+        
+        Rows are ordered by (created_at, recording_id) so a backfill can
+        resume after the last row it checkpointed. Cold partitions are included.
+        
+        Args:
+            embedding_version: Version being backfilled
+            after: (created_at, recording_id) of the last row already handled
+            limit: Maximum rows to return
+        
+        Returns:
+            List of dicts with recording_id, created_at, file_path and quality_tier
+        """
+        source, params = self._recordings_source(datetime.min)
+        after_created_at, after_id = after or (datetime.min, '')
+        with self._cursor() as cursor:
+            results = cursor.execute(f"""
+                SELECT r.recording_id, r.created_at, r.file_path, r.quality_tier
+                FROM {source} r
+                WHERE COALESCE(r.embedding_version, ?) <> ?
+                  AND (r.created_at, r.recording_id) > (?, ?)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM recording_embeddings v
+                      WHERE v.recording_id = r.recording_id AND v.embedding_version = ?
+                  )
+                ORDER BY r.created_at, r.recording_id
+                LIMIT ?
+            """, params + [
+                LEGACY_EMBEDDING_VERSION, embedding_version,
+                after_created_at, after_id, embedding_version, limit
+            ]).fetchall()
+        
+        return [
+            {
+                'recording_id': row[0],
+                'created_at': row[1],
+                'file_path': row[2],
+                'quality_tier': row[3]
+            }
+            for row in results
+        ]
+    
+    def upsert_version_embedding(
+        self,
+        recording_id: str,
+        embedding_version: str,
+        embedding: np.ndarray,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Store (or replace) a recording's embedding for ``embedding_version``."""
+        embedding_list = embedding.tolist() if isinstance(embedding, np.ndarray) else embedding
+        with self._cursor() as cursor:
+            cursor.execute("""
+                INSERT OR REPLACE INTO recording_embeddings (
+                    recording_id, embedding_version, embedding, embedding_dimensions,
+                    created_at, metadata
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                recording_id,
+                embedding_version,
+                embedding_list,
+                len(embedding_list),
+                datetime.now(),
+                json.dumps(metadata) if metadata else None
+            ])
+    
+    def count_missing_embeddings(self, embedding_version: str) -> Dict[str, int]:
+        """
+        Count recordings (cold tier included) with no embedding of ``embedding_version``.
+        
+        Returns:
+            Dict with 'with_audio' (rows a backfill can re-embed) and
+            'without_audio' (no stored audio, so they never will be)
+        """
+        source, params = self._recordings_source(datetime.min)
+        with self._cursor() as cursor:
+            with_audio, without_audio = cursor.execute(f"""
+                SELECT
+                    COUNT(*) FILTER (WHERE r.file_path IS NOT NULL),
+                    COUNT(*) FILTER (WHERE r.file_path IS NULL)
+                FROM {source} r
+                WHERE COALESCE(r.embedding_version, ?) <> ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM recording_embeddings v
+                      WHERE v.recording_id = r.recording_id AND v.embedding_version = ?
+                  )
+            """, params + [LEGACY_EMBEDDING_VERSION, embedding_version, embedding_version]).fetchone()
+        return {'with_audio': with_audio, 'without_audio': without_audio}
+    
+    def count_embedding_versions(self) -> Dict[str, int]:
+        """Count hot-table recordings that have an embedding of each version."""
+        with self._cursor() as cursor:
+            results = cursor.execute("""
+                SELECT version, COUNT(DISTINCT recording_id) FROM (
+                    SELECT recording_id, COALESCE(embedding_version, ?) AS version
+                    FROM recordings WHERE embedding IS NOT NULL
+                    UNION ALL
+                    SELECT v.recording_id, v.embedding_version
+                    FROM recording_embeddings v
+                    JOIN recordings r ON r.recording_id = v.recording_id
+                )
+                GROUP BY version
+                ORDER BY version
+            """, [LEGACY_EMBEDDING_VERSION]).fetchall()
+        return {row[0]: row[1] for row in results}
+    
+    def _search_record(self, row) -> Dict[str, Any]:
+        """Convert a search query row to search-result format (without similarity)."""
+        return {
+            'recording_id': row[0],
+            'user_id': row[1],
+            'created_at': row[3].isoformat() if hasattr(row[3], 'isoformat') else str(row[3]),
+            'mode': row[4],
+            'filename': row[5],
+            'duration_seconds': row[6],
+            'voiceprint_id': row[7],
+            'quality_tier': row[8]
+        }
+    
+    def get_recent_recordings(
+        self,
+        limit: int = 50,
+        since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
         """Get most recent recordings."""
         try:
-            results = self.conn.execute("""
-                SELECT * FROM recordings 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            """, [limit]).fetchall()
+            since = _as_stored_time(since)
+            source, params = self._recordings_source(since)
+            with self._cursor() as cursor:
+                results = cursor.execute(f"""
+                    SELECT {COLUMNS_SQL} FROM {source} 
+                    WHERE created_at >= ?
+                    ORDER BY created_at DESC 
+                    LIMIT ?
+                """, params + [since or datetime.min, limit]).fetchall()
             
             return [self._row_to_dict(row) for row in results]
         except Exception as e:
             logger.error(f"Failed to get recent recordings: {str(e)}")
             return []
     
+    def compact(
+        self,
+        retention_days: int = HOT_RETENTION_DAYS,
+        include_test: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Move old (and optionally test-mode) rows from the hot table to Parquet.
+        
+        Rows are written to a staging directory and deleted from the hot
+        table in one transaction; only after it commits are the files moved
+        into ``cold_path/month=YYYY-MM/mode=<mode>/``. A failed write or
+        delete therefore leaves neither duplicate cold rows nor missing hot
+        ones (see _recover_cold_staging for a crash in between).
+        
+        Args:
+            retention_days: Rows older than this many days are moved
+            include_test: Also move test-mode rows regardless of age
+        
+        Returns:
+            Dictionary with the number of rows moved and the months written
+        """
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        condition = "created_at < ?" + (" OR mode = 'test'" if include_test else "")
+        
+        self._recover_cold_staging()
+        staging = os.path.join(self.cold_path, f".staging-{uuid.uuid4().hex}")
+        with self._cursor() as cursor:
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                cursor.execute(f"""
+                    CREATE OR REPLACE TEMP TABLE compact_batch AS
+                    SELECT {COLUMNS_SQL}, strftime(created_at, '%Y-%m') AS month
+                    FROM recordings
+                    WHERE {condition}
+                """, [cutoff])
+                moved = cursor.execute("SELECT COUNT(*) FROM compact_batch").fetchone()[0]
+                months = [row[0] for row in cursor.execute(
+                    "SELECT DISTINCT month FROM compact_batch ORDER BY month"
+                ).fetchall()]
+                
+                if moved:
+                    os.makedirs(staging)
+                    cursor.execute(f"""
+                        COPY compact_batch TO '{staging}' (
+                            FORMAT PARQUET,
+                            PARTITION_BY (month, mode),
+                            FILENAME_PATTERN 'part_{{uuid}}',
+                            OVERWRITE_OR_IGNORE true
+                        )
+                    """)
+                    cursor.execute("""
+                        DELETE FROM recordings
+                        WHERE recording_id IN (SELECT recording_id FROM compact_batch)
+                    """)
+                
+                cursor.execute("DROP TABLE compact_batch")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        
+        if moved:
+            self._publish_staging(staging)
+        logger.info(f"Compacted {moved} recordings to {self.cold_path} (months: {months})")
+        return {'moved': moved, 'months': months, 'cutoff': cutoff.isoformat()}
+    
+    def _publish_staging(self, staging: str) -> None:
+        """Move a committed compaction's Parquet files into the cold partitions."""
+        for path in sorted(glob.glob(os.path.join(staging, 'month=*', 'mode=*', '*.parquet'))):
+            partition = os.path.relpath(os.path.dirname(path), staging)
+            target_dir = os.path.join(self.cold_path, partition)
+            os.makedirs(target_dir, exist_ok=True)
+            os.replace(path, os.path.join(target_dir, os.path.basename(path)))
+        shutil.rmtree(staging, ignore_errors=True)
+    
+    def _recover_cold_staging(self) -> None:
+        """
+        Settle staging directories left by a compaction that was interrupted.
+        
+        If its rows are still in the hot table the transaction never
+        committed and the files are dropped; otherwise the delete committed
+        and the files are published, so the rows are not lost.
+        """
+        for staging in glob.glob(os.path.join(self.cold_path, '.staging-*')):
+            files = glob.glob(os.path.join(staging, 'month=*', 'mode=*', '*.parquet'))
+            if files:
+                with self._cursor() as cursor:
+                    still_hot = cursor.execute("""
+                        SELECT COUNT(*) FROM recordings
+                        WHERE recording_id IN (
+                            SELECT recording_id FROM read_parquet(?, hive_partitioning = false)
+                        )
+                    """, [files]).fetchone()[0]
+                if not still_hot:
+                    logger.warning(f"Publishing cold files of an interrupted compaction: {staging}")
+                    self._publish_staging(staging)
+                    continue
+            shutil.rmtree(staging, ignore_errors=True)
+    
+    def _cold_files(self, since: Optional[datetime] = None) -> List[str]:
+        """List cold Parquet files in partitions at or after ``since``'s month."""
+        since = _as_stored_time(since)
+        min_month = since.strftime('%Y-%m') if since and since > datetime.min else None
+        files = []
+        for month_dir in sorted(glob.glob(os.path.join(self.cold_path, 'month=*'))):
+            month = os.path.basename(month_dir).split('=', 1)[1]
+            if min_month is None or month >= min_month:
+                files.extend(sorted(glob.glob(os.path.join(month_dir, 'mode=*', '*.parquet'))))
+        return files
+    
+    def _recordings_source(self, since: Optional[datetime]) -> Tuple[str, List[Any]]:
+        """
+        Build the FROM clause for a query.
+        
+        Without a time filter only the hot table is read. With one, the
+        hot table is unioned with the cold partitions for the months the
+        filter reaches, so older partitions are never opened.
+        
+        Returns:
+            Tuple of (SQL source, parameters to prepend)
+        """
+        since = _as_stored_time(since)
+        files = self._cold_files(since) if since is not None else []
+        if not files:
+            return "recordings", []
+        
+        return f"""(
+            SELECT {COLUMNS_SQL} FROM recordings
+            UNION ALL BY NAME
+            SELECT * EXCLUDE (month) FROM read_parquet(
+                ?, hive_partitioning = true, union_by_name = true,
+                hive_types = {{'month': VARCHAR, 'mode': VARCHAR}}
+            )
+        )""", [files]
+    
     def _row_to_dict(self, row) -> Dict[str, Any]:
         """Convert database row to dictionary."""
-        columns = [
-            'recording_id', 'user_id', 'filename', 'file_path',
-            'duration_seconds', 'file_size_bytes', 'sample_rate', 'audio_format',
-            'created_at', 'updated_at', 'mode', 'status',
-            'embedding', 'embedding_dimensions',
-            'voiceprint_id', 'similarity_score', 'matched_user_id', 'metadata'
-        ]
-        result = dict(zip(columns, row))
+        result = dict(zip(RECORDING_COLUMNS, row))
         
         # Parse metadata JSON if present
         if result.get('metadata'):
@@ -0,0 +1,73 @@
+"""
+Quality-weighted voiceprint templates from multi-utterance enrollment.
+Each enrollment clip gets a weight from its quality metrics; the template is
+the weighted mean of the clip embeddings, so verification compares against
+one vector and low-quality clips contribute little or nothing.
+"""
+
+import logging
+import numpy as np
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def quality_weights(
+    metrics: Dict[str, np.ndarray],
+    min_energy: float = 1e-5,
+    snr_range_db: Tuple[float, float] = (10.0, 30.0),
+    band_ratio_range: Tuple[float, float] = (0.4, 0.7),
+    target_speech_seconds: float = 2.0
+) -> np.ndarray:
+    """
+    Turn per-clip quality metrics into template weights in [0, 1].
+
+    Clips quieter than ``min_energy`` (about -50 dBFS RMS) get 0. Otherwise
+    the weight is the product of three scores, each ramping linearly from 0
+    to 1 across its range: SNR against the clip's noise floor (flat hiss or
+    hum has almost none), the share of energy in the speech band (hum and
+    rumble have little), and speech seconds up to ``target_speech_seconds``.
+
+    Args:
+        metrics: Output of batch_quality_metrics on un-normalized audio
+
+    Returns:
+        Weight per clip
+    """
+    def ramp(values: np.ndarray, bounds: Tuple[float, float]) -> np.ndarray:
+        return np.clip((values - bounds[0]) / (bounds[1] - bounds[0]), 0.0, 1.0)
+
+    passes = metrics['energy'] >= min_energy
+    weights = (
+        ramp(metrics['snr_db'], snr_range_db)
+        * ramp(metrics['speech_band_ratio'], band_ratio_range)
+        * np.clip(metrics['speech_seconds'] / target_speech_seconds, 0.0, 1.0)
+    )
+    return np.where(passes, weights, 0.0)
+
+
+def build_template(embeddings: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build a template embedding as the weighted mean of normalized embeddings.
+
+    Args:
+        embeddings: Clip embeddings, shape (clips, dimensions)
+        weights: Weight per clip (at least one must be positive)
+
+    Returns:
+        Tuple of (L2-normalized template, cosine similarity of each clip to it)
+
+    Raises:
+        ValueError: If no clip has a positive weight
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    weights = np.asarray(weights, dtype=np.float32)
+    if not (weights > 0).any():
+        raise ValueError("No enrollment clip has a positive quality weight")
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.where(norms > 0, norms, 1.0)
+
+    template = weights @ normalized
+    template /= np.linalg.norm(template)
+    return template.astype(np.float32), normalized @ template
@@ -0,0 +1,356 @@
+"""
+Checksum-aware model artifact sync between a local directory and a bucket.
+Only files whose SHA-256 changed are transferred, transfers run concurrently
+with retries, interrupted downloads resume, and a manifest records the
+expected contents so the service can verify its model files at startup.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+PUSH_STATE_NAME = ".push_state.json"  # Files already uploaded by an interrupted push
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(local_dir: str) -> Dict[str, Any]:
+    """
+    Hash every file under ``local_dir`` (except the manifest itself).
+
+    Returns:
+        {"files": {relative_path: {"sha256": ..., "size": ...}}, "created_at": ...}
+    """
+    files = {}
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, local_dir).replace("\\", "/")
+            if relative_path in (MANIFEST_NAME, PUSH_STATE_NAME) or name.endswith((".part", ".tmp")):
+                continue
+            files[relative_path] = {"sha256": hash_file(path), "size": os.path.getsize(path)}
+    return {"files": dict(sorted(files.items())), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+
+def read_local_manifest(local_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(local_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_local_manifest(local_dir: str, manifest: Dict[str, Any]) -> None:
+    """
+    Write the manifest next to the files, recording each file's mtime.
+
+    The mtimes (local only, never pushed) let pull trust a file's recorded
+    checksum only while the file has not been touched since it was hashed.
+    """
+    files = {}
+    for relative_path, entry in manifest["files"].items():
+        entry = {k: v for k, v in entry.items() if k != "mtime_ns"}
+        file_path = os.path.join(local_dir, relative_path)
+        if os.path.exists(file_path):
+            entry["mtime_ns"] = os.stat(file_path).st_mtime_ns
+        files[relative_path] = entry
+    manifest = {**manifest, "files": files}
+
+    path = os.path.join(local_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def verify_manifest(local_dir: str, check_hashes: bool = True) -> List[str]:
+    """
+    Compare ``local_dir`` against its manifest.
+
+    Args:
+        local_dir: Directory containing the files and manifest.json
+        check_hashes: Also compare SHA-256 (otherwise sizes only)
+
+    Returns:
+        List of problems (empty if the directory matches the manifest)
+    """
+    manifest = read_local_manifest(local_dir)
+    if manifest is None:
+        return [f"No {MANIFEST_NAME} in {local_dir}"]
+
+    problems = []
+    for relative_path, expected in manifest["files"].items():
+        path = os.path.join(local_dir, relative_path)
+        if not os.path.exists(path):
+            problems.append(f"Missing: {relative_path}")
+        elif os.path.getsize(path) != expected["size"]:
+            problems.append(f"Size mismatch: {relative_path}")
+        elif check_hashes and hash_file(path) != expected["sha256"]:
+            problems.append(f"Checksum mismatch: {relative_path}")
+    return problems
+
+
+class StorageBackend(ABC):
+    """Remote object store holding the model files and manifest under one prefix."""
+
+    @abstractmethod
+    def read_bytes(self, name: str) -> Optional[bytes]:
+        """Return an object's contents, or None if it does not exist."""
+
+    @abstractmethod
+    def write_bytes(self, name: str, data: bytes) -> None:
+        """Create or replace an object with ``data``."""
+
+    @abstractmethod
+    def upload(self, local_path: str, name: str) -> None:
+        """Upload a local file to object ``name``."""
+
+    @abstractmethod
+    def download(self, name: str, local_path: str, offset: int = 0) -> None:
+        """
+        Download object ``name`` into ``local_path``.
+
+        If ``offset`` > 0, only bytes from ``offset`` onwards are fetched and
+        appended to the existing partial file.
+        """
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        data = self.read_bytes(MANIFEST_NAME)
+        return json.loads(data) if data is not None else None
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.write_bytes(MANIFEST_NAME, json.dumps(manifest, indent=2).encode("utf-8"))
+
+
+class LocalBackend(StorageBackend):
+    """Filesystem directory standing in for a bucket (tests, local mirrors)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def __repr__(self) -> str:
+        return f"LocalBackend({os.path.abspath(self.root)})"
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def read_bytes(self, name: str) -> Optional[bytes]:
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def write_bytes(self, name: str, data: bytes) -> None:
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def upload(self, local_path: str, name: str) -> None:
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(local_path, path)
+
+    def download(self, name: str, local_path: str, offset: int = 0) -> None:
+        with open(self._path(name), "rb") as src, open(local_path, "ab" if offset else "wb") as dst:
+            src.seek(offset)
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+class GCSBackend(StorageBackend):
+    """Google Cloud Storage bucket prefix."""
+
+    def __init__(self, bucket_name: str, prefix: str = ""):
+        from google.cloud import storage
+        self.bucket = storage.Client().bucket(bucket_name)
+        self.prefix = prefix.rstrip("/") + "/" if prefix else ""
+
+    def __repr__(self) -> str:
+        return f"GCSBackend(gs://{self.bucket.name}/{self.prefix})"
+
+    def _blob(self, name: str):
+        return self.bucket.blob(self.prefix + name)
+
+    def read_bytes(self, name: str) -> Optional[bytes]:
+        blob = self._blob(name)
+        if not blob.exists():
+            return None
+        return blob.download_as_bytes()
+
+    def write_bytes(self, name: str, data: bytes) -> None:
+        self._blob(name).upload_from_string(data)
+
+    def upload(self, local_path: str, name: str) -> None:
+        self._blob(name).upload_from_filename(local_path)
+
+    def download(self, name: str, local_path: str, offset: int = 0) -> None:
+        with open(local_path, "ab" if offset else "wb") as f:
+            self._blob(name).download_to_file(f, start=offset or None)
+
+
+def _with_retries(action: Callable[[], None], description: str, retries: int, backoff: float) -> None:
+    for attempt in range(retries + 1):
+        try:
+            action()
+            return
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning(f"{description} failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _run_concurrently(tasks: Dict[str, Callable[[], None]], workers: int) -> None:
+    """Run named tasks on a thread pool; raise after all finish if any failed."""
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(task): name for name, task in tasks.items()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failures.append(f"{futures[future]}: {str(e)}")
+    if failures:
+        raise RuntimeError(f"{len(failures)} transfers failed: {'; '.join(failures)}")
+
+
+def push(
+    local_dir: str,
+    backend: StorageBackend,
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 1.0
+) -> Dict[str, Any]:
+    """
+    Upload files whose checksum differs from the remote manifest.
+
+    The remote manifest is written last, so an interrupted push never
+    publishes a manifest for files that are not all uploaded. Completed
+    uploads are journaled locally, so re-running resumes where it stopped.
+
+    Returns:
+        Dict with 'uploaded' and 'skipped' file lists
+    """
+    manifest = build_manifest(local_dir)
+    remote = backend.read_manifest() or {"files": {}}
+
+    state_path = os.path.join(local_dir, PUSH_STATE_NAME)
+    state = {"target": repr(backend), "files": {}}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            saved = json.load(f)
+        if saved.get("target") == repr(backend):
+            state = saved
+    state_lock = threading.Lock()
+
+    def remote_sha(path: str) -> Optional[str]:
+        return state["files"].get(path) or remote["files"].get(path, {}).get("sha256")
+
+    changed = [path for path, entry in manifest["files"].items() if remote_sha(path) != entry["sha256"]]
+    skipped = [path for path in manifest["files"] if path not in changed]
+
+    def upload(path: str) -> None:
+        _with_retries(
+            lambda: backend.upload(os.path.join(local_dir, path), path),
+            f"Upload {path}", retries, backoff
+        )
+        with state_lock:
+            state["files"][path] = manifest["files"][path]["sha256"]
+            with open(state_path, "w") as f:
+                json.dump(state, f)
+
+    logger.info(f"Uploading {len(changed)} changed files ({len(skipped)} unchanged)")
+    _run_concurrently({path: (lambda path=path: upload(path)) for path in changed}, workers)
+
+    backend.write_manifest(manifest)
+    write_local_manifest(local_dir, manifest)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return {"uploaded": changed, "skipped": skipped}
+
+
+def pull(
+    local_dir: str,
+    backend: StorageBackend,
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 1.0
+) -> Dict[str, Any]:
+    """
+    Download files that are missing or differ from the remote manifest.
+
+    Files are written to ``<name>.part`` and renamed after their checksum
+    matches; a leftover ``.part`` from an interrupted pull is resumed from
+    its current size.
+
+    Returns:
+        Dict with 'downloaded' and 'skipped' file lists
+
+    Raises:
+        FileNotFoundError: If the remote has no manifest
+    """
+    remote = backend.read_manifest()
+    if remote is None:
+        raise FileNotFoundError(f"No {MANIFEST_NAME} in remote storage")
+
+    local = read_local_manifest(local_dir) or {"files": {}}
+    changed, skipped = [], []
+    for path, entry in remote["files"].items():
+        local_path = os.path.join(local_dir, path)
+        if not os.path.exists(local_path) or os.path.getsize(local_path) != entry["size"]:
+            changed.append(path)
+            continue
+        # The recorded checksum only vouches for a file untouched since it was
+        # hashed; anything else (same-size corruption included) is re-hashed
+        recorded = local["files"].get(path, {})
+        unchanged_since_hashed = (
+            recorded.get("sha256") == entry["sha256"]
+            and recorded.get("mtime_ns") == os.stat(local_path).st_mtime_ns
+        )
+        up_to_date = unchanged_since_hashed or hash_file(local_path) == entry["sha256"]
+        (skipped if up_to_date else changed).append(path)
+
+    def fetch(path: str) -> None:
+        entry = remote["files"][path]
+        local_path = os.path.join(local_dir, path)
+        part_path = local_path + ".part"
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+        def attempt():
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if offset > entry["size"]:
+                os.remove(part_path)
+                offset = 0
+            if offset < entry["size"]:
+                backend.download(path, part_path, offset)
+            if hash_file(part_path) != entry["sha256"]:
+                os.remove(part_path)
+                raise IOError(f"Checksum mismatch for {path}")
+            os.replace(part_path, local_path)
+
+        _with_retries(attempt, f"Download {path}", retries, backoff)
+
+    logger.info(f"Downloading {len(changed)} changed files ({len(skipped)} up to date)")
+    _run_concurrently({path: (lambda path=path: fetch(path)) for path in changed}, workers)
+
+    write_local_manifest(local_dir, remote)
+    return {"downloaded": changed, "skipped": skipped}
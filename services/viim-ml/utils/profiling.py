@@ -0,0 +1,267 @@
+"""
+On-demand profiling for the inference hot path.
+ForwardProfiler captures torch profiler traces of the next N forward passes;
+sample_stacks records a time-boxed sampling profile of every thread's Python
+stack. Neither does any work unless a capture has been requested.
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads that are parked waiting for work (left out by default)
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+_sampling_lock = threading.Lock()
+
+
+class ForwardProfiler:
+    """
+    Torch profiler armed for the next N forward passes.
+
+    VoiceprintService checks ``armed`` (a plain attribute) before each
+    forward pass and only enters ``capture()`` when it is set, so the
+    profiler costs nothing while idle.
+    """
+
+    def __init__(self):
+        self.armed = False
+        self._lock = threading.Lock()
+        self._requested = 0
+        self._remaining = 0
+        self._in_flight = 0
+        self._pass_ms: List[float] = []
+        self._events: List[Dict[str, Any]] = []
+        self._ops: Dict[str, List[float]] = {}  # name -> [calls, self_cpu_us, cpu_total_us]
+
+    def arm(self, passes: int) -> None:
+        """
+        Capture the next ``passes`` forward passes (drops any previous capture).
+
+        Raises:
+            RuntimeError: If a capture is already in progress
+        """
+        with self._lock:
+            if self.armed or self._in_flight:
+                raise RuntimeError("Forward profiler already armed")
+            self._requested = passes
+            self._remaining = passes
+            self._pass_ms = []
+            self._events = []
+            self._ops = {}
+            self.armed = True
+        logger.info(f"Forward profiler armed for {passes} passes")
+
+    def _claim(self) -> bool:
+        """
+        Take a capture slot if one is left and no other pass is being profiled.
+
+        torch.profiler sessions cannot overlap, so passes that run while
+        another is captured go unprofiled and leave the slot for a later pass.
+        """
+        with self._lock:
+            if self._remaining <= 0 or self._in_flight:
+                return False
+            self._remaining -= 1
+            self._in_flight += 1
+            if self._remaining == 0:
+                self.armed = False
+            return True
+
+    @contextmanager
+    def capture(self) -> Iterator[None]:
+        """
+        Profile the enclosed forward pass if a capture slot is left.
+
+        Profiler failures are logged and the pass runs unprofiled; they
+        never fail the request.
+        """
+        if not self._claim():
+            yield
+            return
+
+        prof = None
+        try:
+            from torch.profiler import profile, ProfilerActivity
+            prof = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            prof.start()
+        except Exception as e:
+            logger.warning(f"Failed to start forward profiler, running unprofiled: {str(e)}")
+            prof = None
+
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                if prof is not None:
+                    prof.stop()
+                    if succeeded:
+                        self._record(prof, elapsed_ms)
+            except Exception as e:
+                logger.warning(f"Failed to record forward profile: {str(e)}")
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+    def _record(self, prof, elapsed_ms: float) -> None:
+        """Merge one pass's chrome trace events and per-op totals."""
+        fd, trace_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            prof.export_chrome_trace(trace_path)
+            with open(trace_path) as f:
+                events = json.load(f).get('traceEvents', [])
+        finally:
+            os.remove(trace_path)
+
+        with self._lock:
+            pass_index = len(self._pass_ms)
+            self._pass_ms.append(round(elapsed_ms, 3))
+            for event in events:
+                event.setdefault('args', {})['pass'] = pass_index
+            self._events.extend(events)
+            for op in prof.key_averages():
+                totals = self._ops.setdefault(op.key, [0, 0.0, 0.0])
+                totals[0] += op.count
+                totals[1] += op.self_cpu_time_total
+                totals[2] += op.cpu_time_total
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'armed': self.armed,
+                'requested': self._requested,
+                'remaining': self._remaining,
+                'captured': len(self._pass_ms),
+                'complete': self._requested > 0 and not self.armed and not self._in_flight,
+            }
+
+    def result(self, top: int = 30) -> Dict[str, Any]:
+        """
+        Captured passes as a Chrome trace (opens in speedscope or Perfetto)
+        plus the ops with the most self CPU time.
+        """
+        with self._lock:
+            ops = sorted(self._ops.items(), key=lambda item: -item[1][1])[:top]
+            return {
+                'pass_ms': list(self._pass_ms),
+                'top_ops': [
+                    {
+                        'name': name,
+                        'calls': int(calls),
+                        'self_cpu_ms': round(self_us / 1000, 3),
+                        'cpu_total_ms': round(total_us / 1000, 3),
+                    }
+                    for name, (calls, self_us, total_us) in ops
+                ],
+                'trace': {'traceEvents': list(self._events), 'displayTimeUnit': 'ms'},
+            }
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def sample_stacks(
+    seconds: float,
+    interval: float = 0.005,
+    include_idle: bool = False
+) -> Dict[str, int]:
+    """
+    Sample every thread's Python stack for ``seconds`` (blocking).
+
+    Args:
+        seconds: How long to sample
+        interval: Time between samples in seconds
+        include_idle: Keep threads parked in wait/select/queue.get
+
+    Returns:
+        Collapsed stacks ("thread;outer;...;leaf") mapped to sample counts
+
+    Raises:
+        RuntimeError: If another sampling profile is running
+    """
+    if not _sampling_lock.acquire(blocking=False):
+        raise RuntimeError("Sampling profile already running")
+
+    try:
+        own_thread = threading.get_ident()
+        counts: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                if not include_idle and _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                counts[';'.join(reversed(stack))] += 1
+            time.sleep(interval)
+        return dict(counts)
+    finally:
+        _sampling_lock.release()
+
+
+def to_collapsed(counts: Dict[str, int]) -> str:
+    """Collapsed-stack text (flamegraph.pl, speedscope, inferno)."""
+    return ''.join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+def to_speedscope(counts: Dict[str, int], interval: float, name: str = "viim-ml") -> Dict[str, Any]:
+    """Speedscope sampled-profile JSON, weighted in milliseconds."""
+    frames: List[Dict[str, str]] = []
+    frame_index: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in sorted(counts.items()):
+        indices = []
+        for frame in stack.split(';'):
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({'name': frame})
+            indices.append(frame_index[frame])
+        samples.append(indices)
+        weights.append(count * interval * 1000)
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        }],
+        'name': name,
+        'exporter': 'viim-ml',
+    }
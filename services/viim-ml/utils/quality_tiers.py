@@ -0,0 +1,44 @@
+"""
+Latency/quality tiers for embedding extraction.
+Each tier bounds the analyzed duration and picks the resampler and model precision.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    """Extraction settings for one latency tier."""
+    name: str
+    max_duration: Optional[float]  # Center crop length in seconds (None = whole clip)
+    res_type: str  # librosa resampler ('soxr_qq' is fastest, 'soxr_hq' is librosa's default)
+    precision: str  # Model precision ('float32' or 'bfloat16'; bfloat16 falls back to float32 on CPUs without bf16)
+
+
+QUALITY_TIERS = {
+    # Interactive traffic (e.g. test mode): bounded latency
+    'fast': QualityTier(name='fast', max_duration=3.0, res_type='soxr_qq', precision='bfloat16'),
+    'balanced': QualityTier(name='balanced', max_duration=6.0, res_type='soxr_mq', precision='float32'),
+    # Enrollment: full clip at full quality (previous behavior)
+    'accurate': QualityTier(name='accurate', max_duration=None, res_type='soxr_hq', precision='float32'),
+}
+
+DEFAULT_TIER = 'accurate'
+
+
+def get_tier(name: Optional[str]) -> QualityTier:
+    """
+    Look up a quality tier by name.
+
+    Raises:
+        ValueError: If the tier name is unknown
+    """
+    if not name:
+        return QUALITY_TIERS[DEFAULT_TIER]
+    tier = QUALITY_TIERS.get(name.lower())
+    if tier is None:
+        raise ValueError(
+            f"Unknown quality tier: {name} (expected one of {', '.join(QUALITY_TIERS)})"
+        )
+    return tier
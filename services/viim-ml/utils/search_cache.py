@@ -0,0 +1,200 @@
+"""
+LRU cache for nearest-recording search results.
+Entries are keyed by a quantized query embedding plus the search parameters
+and are patched in place when a new recording could enter a cached top-k.
+"""
+
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ('query', 'threshold', 'limit', 'exclude_id', 'since', 'embedding_version', 'matches')
+
+    def __init__(self, query, threshold, limit, exclude_id, since, embedding_version, matches):
+        self.query = query
+        self.threshold = threshold
+        self.limit = limit
+        self.exclude_id = exclude_id
+        self.since = since
+        self.embedding_version = embedding_version
+        self.matches = matches
+
+
+class SearchResultCache:
+    """
+    LRU cache of search results with insert-time patching.
+
+    The key quantizes the normalized query embedding, so the same embedding
+    sent again (e.g. after a JSON round trip) hits the cache. When a
+    recording is inserted, every entry whose top-k it would enter gets the
+    new match merged in, so cached results stay identical to a fresh search.
+
+    A search still running when a recording is inserted (or the cache is
+    cleared) may have missed the change, so its results are only stored if
+    the cache ``generation`` read before the search is still current.
+    """
+
+    def __init__(self, capacity: int = 256, quantization: float = 1e-3):
+        """
+        Args:
+            capacity: Maximum number of cached queries
+            quantization: Bucket width for embedding components in the key
+        """
+        self.capacity = capacity
+        self.quantization = quantization
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by every insert and clear
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._patched = 0
+        self._invalidations = 0
+        self._stale_puts = 0
+
+    @property
+    def generation(self) -> int:
+        """Current generation; read it before searching and pass it to put()."""
+        with self._lock:
+            return self._generation
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def key(
+        self,
+        query_embedding: np.ndarray,
+        threshold: float,
+        limit: int,
+        exclude_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        embedding_version: Optional[str] = None
+    ) -> Hashable:
+        """Build the cache key for a search."""
+        buckets = np.round(self._normalize(query_embedding) / self.quantization).astype(np.int32)
+        return (buckets.tobytes(), float(threshold), int(limit), exclude_id, since, embedding_version)
+
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """Return cached matches (and mark them recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return list(entry.matches)
+
+    def put(
+        self,
+        key: Hashable,
+        query_embedding: np.ndarray,
+        threshold: float,
+        limit: int,
+        exclude_id: Optional[str],
+        since: Optional[datetime],
+        embedding_version: Optional[str],
+        matches: List[Dict[str, Any]],
+        generation: Optional[int] = None
+    ) -> None:
+        """
+        Store search results, evicting the least recently used entry if full.
+
+        If ``generation`` is given and a recording was inserted or the cache
+        was cleared since it was read, the results may be stale and are not stored.
+        """
+        if self.capacity <= 0:
+            return
+        entry = _CacheEntry(
+            self._normalize(query_embedding), threshold, limit, exclude_id, since,
+            embedding_version, list(matches)
+        )
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stale_puts += 1
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def on_insert(
+        self,
+        record: Dict[str, Any],
+        embedding: np.ndarray,
+        embedding_version: Optional[str] = None
+    ) -> None:
+        """
+        Patch cached results that a newly inserted recording belongs in.
+
+        Matches RecordingDatabase.add_insert_listener's callback signature.
+        If ``embedding_version`` is given, only searches of that version (or
+        unversioned searches) are patched.
+        """
+        embedding = self._normalize(embedding)
+        with self._lock:
+            self._generation += 1
+            entries = [
+                entry for entry in self._entries.values()
+                if embedding_version is None or entry.embedding_version in (None, embedding_version)
+            ]
+            if not entries:
+                return
+            queries = np.stack([entry.query for entry in entries])
+            if queries.shape[1] != len(embedding):
+                return
+            similarities = queries @ embedding
+
+            for entry, similarity in zip(entries, similarities):
+                similarity = float(similarity)
+                if similarity < entry.threshold or record['recording_id'] == entry.exclude_id:
+                    continue
+                matches = entry.matches
+                if any(m['recording_id'] == record['recording_id'] for m in matches):
+                    continue  # Cached by a search that already saw the row
+                if len(matches) >= entry.limit and similarity <= matches[-1]['similarity']:
+                    continue
+
+                match = {**record, 'similarity': similarity}
+                position = next(
+                    (i for i, m in enumerate(matches) if m['similarity'] < similarity),
+                    len(matches)
+                )
+                matches.insert(position, match)
+                del matches[entry.limit:]
+                self._patched += 1
+
+    def clear(self) -> None:
+        """Drop all entries (e.g. after rows were removed from the searched table)."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for export."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'capacity': self.capacity,
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'patched': self._patched,
+                'invalidations': self._invalidations,
+                'stale_puts': self._stale_puts,
+            }
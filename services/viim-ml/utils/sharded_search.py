@@ -0,0 +1,335 @@
+"""
+Sharded nearest-recording search across local worker processes.
+Recordings are hash-partitioned across shard processes that each hold their
+own embedding matrix; a coordinator scatters queries and merges per-shard top-k.
+"""
+
+import hashlib
+import heapq
+import logging
+import multiprocessing as mp
+import threading
+import numpy as np
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for(recording_id: str, num_shards: int) -> int:
+    """Stable hash partition of a recording id (same shard across restarts)."""
+    digest = hashlib.md5(recording_id.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') % num_shards
+
+
+class _EmbeddingSegment:
+    """One shard's embeddings: a growable normalized matrix plus row metadata."""
+
+    def __init__(self, dimensions: int = 192):
+        self.matrix = np.zeros((1024, dimensions), dtype=np.float32)
+        self.records: List[Dict[str, Any]] = []
+        self.ids = set()
+
+    def add(self, records: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        # A recording inserted during a reload can arrive both live and in the reloaded rows
+        keep = [i for i, record in enumerate(records) if record['recording_id'] not in self.ids]
+        if not keep:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(keep) < len(records):
+            records = [records[i] for i in keep]
+            embeddings = embeddings[keep]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms > 0, norms, 1.0)
+
+        count = len(self.records)
+        if embeddings.shape[1] != self.matrix.shape[1]:
+            if count:
+                raise ValueError(
+                    f"Embedding dimension mismatch: {embeddings.shape[1]} vs {self.matrix.shape[1]}"
+                )
+            self.matrix = np.zeros((len(self.matrix), embeddings.shape[1]), dtype=np.float32)
+
+        needed = count + len(embeddings)
+        if needed > len(self.matrix):
+            capacity = max(needed, 2 * len(self.matrix))
+            grown = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+            grown[:count] = self.matrix[:count]
+            self.matrix = grown
+
+        self.matrix[count:needed] = embeddings
+        self.records.extend(records)
+        self.ids.update(record['recording_id'] for record in records)
+
+    def search(
+        self,
+        query: np.ndarray,
+        threshold: float,
+        limit: int,
+        exclude_id: Optional[str]
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        count = len(self.records)
+        if count == 0 or limit < 1 or len(query) != self.matrix.shape[1]:
+            return []
+
+        similarities = self.matrix[:count] @ query
+        candidates = np.flatnonzero(similarities >= threshold)
+        if exclude_id is not None:
+            candidates = np.array(
+                [i for i in candidates if self.records[i]['recording_id'] != exclude_id],
+                dtype=np.int64
+            )
+        if len(candidates) > limit:
+            top = np.argpartition(-similarities[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+
+        return [(float(similarities[i]), self.records[i]) for i in candidates]
+
+
+def _shard_main(conn, dimensions: int) -> None:
+    """
+    Shard process loop: apply add/stage/swap commands and answer searches.
+
+    During a reload the new contents are built in a staged segment while
+    searches keep reading the current one; live adds go to both. Each reply
+    carries the request id it answers, or an exception the caller re-raises.
+    """
+    segment = _EmbeddingSegment(dimensions)
+    staged: Optional[_EmbeddingSegment] = None
+    while True:
+        request_id, command, payload = conn.recv()
+        if command == 'stop':
+            conn.close()
+            return
+        try:
+            if command == 'add':
+                segment.add(*payload)
+                if staged is not None:
+                    staged.add(*payload)
+                result = len(segment.records)
+            elif command == 'search':
+                result = segment.search(*payload)
+            elif command == 'begin':
+                staged = _EmbeddingSegment(dimensions)
+                result = 0
+            elif command == 'stage':
+                staged.add(*payload)
+                result = len(staged.records)
+            elif command == 'swap':
+                segment, staged = staged, None
+                result = len(segment.records)
+            elif command == 'abort':
+                staged = None
+                result = 0
+            else:
+                raise ValueError(f"Unknown shard command: {command}")
+            conn.send((request_id, result, None))
+        except Exception as e:
+            conn.send((request_id, None, e))
+
+
+class _ShardConnection:
+    """
+    Multiplexed pipe to one shard process.
+
+    Requests are tagged with an id and answered through futures by a reader
+    thread, so several callers can have requests in flight on the same shard
+    (the shard answers them in order) without holding a lock for the round trip.
+    """
+
+    def __init__(self, conn, name: str):
+        self._conn = conn
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._next_id = 0
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_replies, name=f"{name}-replies", daemon=True)
+        self._reader.start()
+
+    def request(self, command: str, payload: Any = None) -> Future:
+        """Send one command; the future resolves with the shard's reply."""
+        future: Future = Future()
+        with self._send_lock:
+            if self._closed:
+                raise RuntimeError("Search shard connection is closed")
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = future
+            try:
+                self._conn.send((request_id, command, payload))
+            except Exception:
+                del self._pending[request_id]
+                raise
+        return future
+
+    def _read_replies(self) -> None:
+        while True:
+            try:
+                request_id, result, error = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        self._fail_pending(RuntimeError("Search shard process exited"))
+
+    def _fail_pending(self, error: Exception) -> None:
+        with self._send_lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def close(self) -> None:
+        """Ask the shard to stop and fail any requests still waiting."""
+        with self._send_lock:
+            if not self._closed:
+                self._closed = True
+                try:
+                    self._conn.send((None, 'stop', None))
+                except (BrokenPipeError, OSError):
+                    pass
+        self._reader.join(timeout=5)
+        self._fail_pending(RuntimeError("Search shard connection is closed"))
+        self._conn.close()
+
+
+class ShardedSearch:
+    """
+    Coordinator for N shard processes.
+
+    Queries are scattered to every shard and the per-shard top-k lists are
+    merged, so each shard scans only 1/N of the embeddings and all shards
+    scan in parallel. Threshold and exclusion are applied inside the shards,
+    so the merged list needs no over-fetching.
+    """
+
+    def __init__(self, num_shards: int, dimensions: int = 192, batch_size: int = 1000):
+        if num_shards < 1:
+            raise ValueError(f"num_shards must be >= 1 (got {num_shards})")
+
+        self.num_shards = num_shards
+        self.batch_size = batch_size
+        self._reload_lock = threading.Lock()
+        # Held only while a request is sent to every shard, so each shard sees
+        # searches and swaps in the same order: a search reads all-old or all-new
+        self._scatter_lock = threading.Lock()
+        self._conns: List[_ShardConnection] = []
+        self._processes = []
+
+        ctx = mp.get_context('spawn')  # Don't fork a process holding torch/DuckDB state
+        for shard_id in range(num_shards):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=_shard_main,
+                args=(child_conn, dimensions),
+                name=f"search-shard-{shard_id}",
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._conns.append(_ShardConnection(parent_conn, f"search-shard-{shard_id}"))
+            self._processes.append(process)
+
+        logger.info(f"Started {num_shards} search shard processes")
+
+    def load(self, fetch_rows: Callable[[], Iterable[Tuple[Dict[str, Any], Any]]]) -> int:
+        """
+        Rebuild all shards from ``fetch_rows()`` (blocking).
+
+        The new contents are staged next to the current ones and swapped in
+        on every shard at once, so searches see either the old or the new
+        contents, never a partial load. Rows are fetched after staging
+        starts, and recordings added meanwhile go to both, so none are lost.
+
+        Args:
+            fetch_rows: Returns (record, embedding) pairs, e.g. from
+                RecordingDatabase.get_embedding_rows
+
+        Returns:
+            Total number of recordings loaded
+        """
+        with self._reload_lock:
+            self._broadcast('begin')
+            try:
+                records: List[list] = [[] for _ in range(self.num_shards)]
+                embeddings: List[list] = [[] for _ in range(self.num_shards)]
+                total = 0
+                for record, embedding in fetch_rows():
+                    shard_id = shard_for(record['recording_id'], self.num_shards)
+                    records[shard_id].append(record)
+                    embeddings[shard_id].append(embedding)
+                    total += 1
+                    if len(records[shard_id]) >= self.batch_size:
+                        self._send_batch('stage', shard_id, records[shard_id], embeddings[shard_id])
+                        records[shard_id], embeddings[shard_id] = [], []
+
+                for shard_id in range(self.num_shards):
+                    if records[shard_id]:
+                        self._send_batch('stage', shard_id, records[shard_id], embeddings[shard_id])
+            except Exception:
+                self._broadcast('abort')
+                raise
+
+            self._broadcast('swap')
+
+        logger.info(f"Loaded {total} recordings into {self.num_shards} shards")
+        return total
+
+    def _scatter(self, command: str, payload: Any = None) -> list:
+        with self._scatter_lock:
+            futures = [conn.request(command, payload) for conn in self._conns]
+        return [future.result() for future in futures]
+
+    def _broadcast(self, command: str) -> None:
+        self._scatter(command)
+
+    def add(self, record: Dict[str, Any], embedding: Any) -> None:
+        """Route one new recording to its shard."""
+        shard_id = shard_for(record['recording_id'], self.num_shards)
+        self._send_batch('add', shard_id, [record], [embedding])
+
+    def _send_batch(self, command: str, shard_id: int, records: list, embeddings: list) -> None:
+        # Embeddings travel as one contiguous array, which pickles far faster than lists
+        batch = np.asarray(embeddings, dtype=np.float32)
+        self._conns[shard_id].request(command, (records, batch)).result()
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        threshold: float = 0.7,
+        limit: int = 10,
+        exclude_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Scatter a query to all shards and merge their top-k results.
+
+        Returns:
+            Matches in the same format as RecordingDatabase.search_by_embedding
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        shard_results = self._scatter('search', (query, threshold, limit, exclude_id))
+
+        merged = heapq.nlargest(
+            limit,
+            (hit for hits in shard_results for hit in hits),
+            key=lambda hit: hit[0]
+        )
+        return [{**record, 'similarity': similarity} for similarity, record in merged]
+
+    def close(self) -> None:
+        """Stop all shard processes."""
+        for conn in self._conns:
+            conn.close()
+        for process in self._processes:
+            process.join(timeout=5)
+        logger.info("Stopped search shard processes")
@@ -0,0 +1,240 @@
+"""
+Incremental audio buffering for live-microphone streaming.
+Accepts PCM or Opus (WebM/Ogg) frames as they are recorded and keeps a
+16kHz waveform ready for provisional and final embeddings.
+"""
+
+import numpy as np
+import logging
+import time
+from typing import Optional
+from utils.audio_processor import decode_audio, frame_energy_db
+
+logger = logging.getLogger(__name__)
+
+PCM_ENCODINGS = {
+    'pcm_s16le': np.int16,
+    'pcm_f32le': np.float32,
+}
+CONTAINER_ENCODINGS = ('webm', 'ogg')
+
+# WebSocket close codes for streams that pass a cap
+CLOSE_TOO_BIG = 1009
+CLOSE_POLICY = 1008
+
+
+class StreamLimitExceeded(ValueError):
+    """Raised when a stream passes its byte or duration cap."""
+
+    def __init__(self, message: str, close_code: int):
+        super().__init__(message)
+        self.close_code = close_code
+
+
+class StreamingSession:
+    """
+    Buffers streamed audio frames and tracks how much speech has arrived.
+
+    Raw PCM is resampled incrementally with a streaming soxr resampler, so
+    each frame is converted once as it arrives. Opus frames inside a
+    WebM/Ogg container cannot be decoded in isolation; their bytes are
+    accumulated and the container is decoded when audio is requested.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        encoding: str = 'pcm_f32le',
+        target_sr: int = 16000,
+        min_speech_seconds: float = 1.5,
+        update_interval: float = 1.0,
+        max_duration: float = 10.0,
+        speech_threshold_db: float = 35.0,
+        max_bytes: int = 8 * 1024 * 1024,
+        max_session_seconds: float = 30.0
+    ):
+        """
+        Args:
+            sample_rate: Sample rate of incoming PCM frames (ignored for containers)
+            encoding: 'pcm_s16le', 'pcm_f32le', 'webm' or 'ogg'
+            target_sr: Model sample rate
+            min_speech_seconds: Speech needed before the first provisional result
+            update_interval: Seconds of new speech between provisional results
+            max_duration: Audio beyond this many seconds is ignored
+            speech_threshold_db: Frames within this many dB of the peak count as speech
+            max_bytes: Most bytes accepted over the whole stream
+            max_session_seconds: Most wall time from start to stop
+        """
+        if encoding not in PCM_ENCODINGS and encoding not in CONTAINER_ENCODINGS:
+            raise ValueError(
+                f"Unsupported encoding: {encoding} "
+                f"(expected one of {', '.join([*PCM_ENCODINGS, *CONTAINER_ENCODINGS])})"
+            )
+        if encoding in PCM_ENCODINGS and sample_rate <= 0:
+            raise ValueError(f"Invalid sample rate: {sample_rate}")
+
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.target_sr = target_sr
+        self.min_speech_seconds = min_speech_seconds
+        self.update_interval = update_interval
+        self.max_duration = max_duration
+        self.speech_threshold_db = speech_threshold_db
+        self.max_bytes = max_bytes
+        self.max_session_seconds = max_session_seconds
+
+        self.bytes_received = 0
+        self.truncated = False
+        self._chunks: list[np.ndarray] = []
+        self._samples = 0
+        self._container = bytearray()
+        self._pending = b''  # Partial PCM sample left over from the last frame
+        self._last_emit_speech = 0.0
+        self._last_check_samples = 0
+        self._last_check_time = time.monotonic()
+        self._started = self._last_check_time
+        self._resampler = None
+
+        if encoding in PCM_ENCODINGS and sample_rate != target_sr:
+            import soxr
+            self._resampler = soxr.ResampleStream(
+                sample_rate, target_sr, 1, dtype='float32', quality='HQ'
+            )
+
+    @property
+    def is_container(self) -> bool:
+        return self.encoding in CONTAINER_ENCODINGS
+
+    def remaining_seconds(self) -> float:
+        """Wall time left before the stream passes max_session_seconds."""
+        return self.max_session_seconds - (time.monotonic() - self._started)
+
+    def feed(self, data: bytes) -> None:
+        """
+        Append one recorded frame.
+
+        Raises:
+            StreamLimitExceeded: If the stream passed max_bytes (close code
+                1009) or max_session_seconds (close code 1008)
+        """
+        self.bytes_received += len(data)
+        if self.bytes_received > self.max_bytes:
+            raise StreamLimitExceeded(
+                f"Stream too large (maximum {self.max_bytes} bytes)", CLOSE_TOO_BIG
+            )
+        if self.remaining_seconds() <= 0:
+            raise StreamLimitExceeded(
+                f"Stream too long (maximum {self.max_session_seconds:g}s)", CLOSE_POLICY
+            )
+
+        # Audio past max_duration is dropped, so later frames are not kept either
+        if self.truncated:
+            return
+
+        if self.is_container:
+            self._container.extend(data)
+            return
+
+        # Frames may split a sample; carry the remainder to the next frame
+        dtype = PCM_ENCODINGS[self.encoding]
+        data = self._pending + data
+        usable = len(data) - len(data) % np.dtype(dtype).itemsize
+        self._pending = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=dtype)
+        if dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+
+        self._append(samples.astype(np.float32, copy=False), last=False)
+
+    def _append(self, samples: np.ndarray, last: bool) -> None:
+        """Resample (if needed) and append samples to the buffer."""
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples, last=last)
+
+        room = int(self.max_duration * self.target_sr) - self._samples
+        if len(samples) > room:
+            samples = samples[:max(room, 0)]
+            self.truncated = True
+
+        if len(samples):
+            self._chunks.append(samples)
+            self._samples += len(samples)
+
+    def audio(self) -> np.ndarray:
+        """
+        Return the buffered audio as a 16kHz mono waveform (blocking).
+
+        Containers are decoded from the start each time, so call this from
+        the threadpool; an incomplete container may fail to decode until
+        more frames arrive.
+        """
+        if self.is_container:
+            return self._decode_container()
+
+        if len(self._chunks) > 1:
+            self._chunks = [np.concatenate(self._chunks)]
+        return self._chunks[0] if self._chunks else np.zeros(0, dtype=np.float32)
+
+    def _decode_container(self) -> np.ndarray:
+        """Decode the accumulated WebM/Ogg bytes (may be an incomplete stream)."""
+        if not self._container:
+            return np.zeros(0, dtype=np.float32)
+
+        import librosa
+        audio, sr = decode_audio(bytes(self._container))
+        if sr != self.target_sr:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=self.target_sr)
+
+        max_samples = int(self.max_duration * self.target_sr)
+        if len(audio) > max_samples:
+            audio = audio[:max_samples]
+            self.truncated = True
+        return audio.astype(np.float32, copy=False)
+
+    def speech_seconds(self, audio: Optional[np.ndarray] = None) -> float:
+        """Estimate how many seconds of speech have been buffered."""
+        if audio is None:
+            audio = self.audio()
+        if len(audio) == 0:
+            return 0.0
+
+        energy_db, _, hop_length = frame_energy_db(audio, self.target_sr)
+        voiced_frames = np.count_nonzero(energy_db > -self.speech_threshold_db)
+        return voiced_frames * hop_length / self.target_sr
+
+    def needs_check(self, check_interval: float = 0.25) -> bool:
+        """
+        Whether enough new audio arrived to re-evaluate the buffer.
+
+        PCM is checked every ``check_interval`` seconds of audio. Containers
+        must be re-decoded to be checked, so they are checked at most once per
+        ``update_interval`` of wall time.
+        """
+        if self.is_container:
+            now = time.monotonic()
+            if now - self._last_check_time < self.update_interval:
+                return False
+            self._last_check_time = now
+            return True
+
+        if self._samples - self._last_check_samples < check_interval * self.target_sr:
+            return False
+        self._last_check_samples = self._samples
+        return True
+
+    def should_emit(self, speech_seconds: float) -> bool:
+        """Whether enough new speech has accumulated for a provisional result."""
+        if speech_seconds < self.min_speech_seconds:
+            return False
+        if self._last_emit_speech == 0.0:
+            return True
+        return speech_seconds - self._last_emit_speech >= self.update_interval
+
+    def mark_emitted(self, speech_seconds: float) -> None:
+        self._last_emit_speech = speech_seconds
+
+    def finish(self) -> np.ndarray:
+        """Flush the resampler and return the complete waveform."""
+        if self._resampler is not None and not self.truncated:
+            self._append(np.zeros(0, dtype=np.float32), last=True)
+        return self.audio()
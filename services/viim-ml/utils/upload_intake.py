@@ -0,0 +1,278 @@
+"""
+Upload intake checks that run before decoding.
+Enforces a byte limit while the request body streams in, probes container
+headers for duration and sample rate, and checks a decoded prefix for signal,
+so bad uploads are rejected before the full decode and inference stages.
+"""
+
+import json
+import logging
+import subprocess
+import numpy as np
+from io import BytesIO
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT_SECONDS = 5.0
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the configured byte limit."""
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects oversized request bodies with 413.
+
+    The Content-Length header is checked before any body is read, and the
+    byte count is enforced while the body streams in (chunked bodies have no
+    Content-Length), so an oversized upload is never fully buffered or
+    spooled to disk.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str] = ()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.paths and scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    if response_started:
+                        raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+                    # Answer here: an error raised into the app would surface
+                    # from the form parser as 400. The app now sees a disconnect
+                    # and whatever it sends is dropped.
+                    rejected = True
+                    await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Upload too large (maximum {self.max_bytes} bytes)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_upload(upload, max_bytes: int, chunk_size: int = 64 * 1024) -> bytes:
+    """
+    Read an UploadFile in chunks, stopping as soon as it exceeds ``max_bytes``.
+
+    Raises:
+        UploadTooLarge: If the file is larger than ``max_bytes``
+    """
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLarge(f"Upload too large (maximum {max_bytes} bytes)")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def probe_audio(audio_bytes: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Read duration and sample rate from container headers without decoding.
+
+    Tries soundfile (WAV, FLAC, Ogg) first and falls back to ffprobe for
+    other containers (WebM, MP3, M4A). ffprobe reads from a pipe, so
+    containers that need seeking (M4A/MP4 with the moov atom at the end)
+    can fail to probe although they decode fine; that is inconclusive, not
+    a rejection.
+
+    Returns:
+        Dict with 'duration' (None if the header has none, as with
+        MediaRecorder WebM), 'sample_rate' and 'source', or None if the
+        container could not be probed (the full decode then decides)
+
+    Raises:
+        ValueError: If ffprobe read the container and it has no audio stream
+    """
+    import soundfile as sf
+    
+    try:
+        info = sf.info(BytesIO(audio_bytes))
+        return {
+            'duration': info.frames / info.samplerate if info.frames > 0 else None,
+            'sample_rate': info.samplerate,
+            'source': 'soundfile',
+        }
+    except Exception:
+        pass
+
+    try:
+        result = subprocess.run(
+            [
+                'ffprobe', '-v', 'error',
+                '-show_entries', 'format=duration:stream=sample_rate,codec_type',
+                '-of', 'json', '-i', 'pipe:0',
+            ],
+            input=audio_bytes,
+            capture_output=True,
+            timeout=PROBE_TIMEOUT_SECONDS,
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"ffprobe unavailable: {str(e)}")
+        return None
+
+    if result.returncode != 0:
+        logger.info(f"ffprobe could not probe upload: {result.stderr.decode(errors='replace').strip()}")
+        return None
+
+    data = json.loads(result.stdout or b"{}")
+    streams = [s for s in data.get('streams', []) if s.get('codec_type') == 'audio']
+    if not streams:
+        raise ValueError("Failed to load audio: no audio stream found")
+
+    duration = data.get('format', {}).get('duration')
+    sample_rate = streams[0].get('sample_rate')
+    return {
+        'duration': float(duration) if duration not in (None, 'N/A') else None,
+        'sample_rate': int(sample_rate) if sample_rate else None,
+        'source': 'ffprobe',
+    }
+
+
+def check_probe(
+    probe: Dict[str, Any],
+    min_duration: float = 1.0,
+    max_duration: float = 10.0,
+    min_sample_rate: int = 8000
+) -> None:
+    """
+    Reject uploads whose header duration or sample rate is out of range.
+
+    Uses the same duration bounds as preprocess_audio.
+
+    Raises:
+        ValueError: If duration or sample rate is out of range
+    """
+    duration = probe.get('duration')
+    if duration is not None:
+        if duration < min_duration:
+            raise ValueError(f"Audio too short: {duration:.2f}s (minimum {min_duration:g}s)")
+        if duration > max_duration:
+            raise ValueError(f"Audio too long: {duration:.2f}s (maximum {max_duration:g}s)")
+
+    sample_rate = probe.get('sample_rate')
+    if sample_rate is not None and sample_rate < min_sample_rate:
+        raise ValueError(f"Sample rate too low: {sample_rate}Hz (minimum {min_sample_rate}Hz)")
+
+
+def decode_prefix(audio_bytes: bytes, probe: Dict[str, Any], seconds: float = 2.0) -> Optional[np.ndarray]:
+    """
+    Decode only the first ``seconds`` of audio as mono float32.
+
+    Returns:
+        The decoded prefix, or None if it could not be decoded cheaply
+    """
+    if probe.get('source') == 'soundfile':
+        import soundfile as sf
+        try:
+            frames = int(seconds * probe['sample_rate'])
+            prefix, _ = sf.read(BytesIO(audio_bytes), frames=frames, dtype='float32', always_2d=True)
+            return prefix.mean(axis=1)
+        except Exception:
+            return None
+
+    try:
+        result = subprocess.run(
+            [
+                'ffmpeg', '-v', 'error', '-i', 'pipe:0',
+                '-t', str(seconds), '-ac', '1', '-f', 'f32le', 'pipe:1',
+            ],
+            input=audio_bytes,
+            capture_output=True,
+            timeout=PROBE_TIMEOUT_SECONDS,
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def check_prefix_energy(prefix: np.ndarray, min_peak: float = 1e-4) -> None:
+    """
+    Reject digitally silent input (muted or disconnected microphone).
+
+    The floor (-80 dBFS) is below any live microphone's noise floor, so quiet
+    lead-in before speech still passes; only dead signal is rejected here.
+
+    Raises:
+        ValueError: If the prefix has no signal
+    """
+    if len(prefix) == 0:
+        raise ValueError("Failed to load audio: no samples decoded")
+    if np.abs(prefix).max() < min_peak:
+        raise ValueError("Audio is silent (check that the microphone is not muted)")
+
+
+def inspect_upload(audio_bytes: bytes, prefix_seconds: float = 2.0) -> Optional[Dict[str, Any]]:
+    """
+    Run the header probe and prefix energy check (blocking, cheap).
+
+    Returns:
+        The probe result, or None if the container could not be probed
+        (the full decode then decides)
+
+    Raises:
+        ValueError: If the upload is out of range or silent
+    """
+    probe = probe_audio(audio_bytes)
+    if probe is None:
+        return None
+
+    check_probe(probe)
+
+    prefix = decode_prefix(audio_bytes, probe, prefix_seconds)
+    if prefix is not None:
+        check_prefix_energy(prefix)
+
+    return probe